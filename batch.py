@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Batch command-line entry point.
+
+Hide messages in, or reveal messages from, a directory or manifest of
+carriers across a process pool.
+
+    python batch.py hide carriers/ --output stego/ --message "stamp" --workers 8
+    python batch.py hide --manifest jobs.csv --workers 8
+    python batch.py unhide stego/ --results found.jsonl
+    python batch.py probe incoming/ --results payloads.jsonl
+
+probe reads only the payload header of each carrier and reports whether it
+holds a payload (see UnhideImage.probe), without extracting it.
+
+A manifest is a CSV file with a header row and the columns carrier, output
+and message (output and message are only needed for hide).
+
+Messages are stored as UTF-8 behind the payload header (embed_text and
+extract_text), the format probe looks for. --format legacy uses the older
+NUL-terminated *_text_lsb/*_text_pvd formats instead.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from hide import HideImage, HideAudio
+from unhide import UnhideImage, UnhideAudio
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.ppm', '.pgm'}
+AUDIO_EXTENSIONS = {'.wav'}
+
+
+def is_audio(path):
+    return os.path.splitext(path)[1].lower() in AUDIO_EXTENSIONS
+
+
+def run_job(job):
+    # Worker: run one hide/unhide job and report (carrier, error, result, bytes)
+    operation, method, use_mmap, key, text_format, carrier, output, message = job
+    # The method only applies to images; audio always uses LSB
+    if is_audio(carrier):
+        method = 'lsb'
+    try:
+        size = os.path.getsize(carrier)
+        if method == 'pvd' and key is not None:
+            raise ValueError("Keyed scattering is only available for LSB.")
+        # Keyed LSB takes the key; PVD is called without it
+        options = {} if key is None else {'key': key}
+        legacy = text_format == 'legacy'
+        if operation == 'hide':
+            if is_audio(carrier):
+                stego = HideAudio(carrier, output, use_mmap=use_mmap)
+                if legacy:
+                    stego.embed_text_lsb(message, **options)
+                else:
+                    stego.embed_text(message, **options)
+            else:
+                stego = HideImage(carrier, output, use_mmap=use_mmap)
+                if legacy:
+                    getattr(stego, f'embed_text_{method}')(message, **options)
+                else:
+                    stego.embed_text(message, method, **options)
+            return carrier, None, output, size
+        if operation == 'probe':
+            if is_audio(carrier):
+                found = UnhideAudio(carrier, use_mmap=use_mmap).probe(**options)
+            else:
+                found = UnhideImage(carrier, use_mmap=use_mmap).probe(method, **options)
+            return carrier, None, found, size
+        if is_audio(carrier):
+            stego = UnhideAudio(carrier, use_mmap=use_mmap)
+            found = stego.extract_text_lsb(**options) if legacy else stego.extract_text(**options)
+        else:
+            stego = UnhideImage(carrier, use_mmap=use_mmap)
+            if legacy:
+                found = getattr(stego, f'extract_text_{method}')(**options)
+            else:
+                found = stego.extract_text(method, **options)
+        return carrier, None, found, size
+    except Exception as e:
+        return carrier, str(e), None, 0
+
+
+def output_name(carrier, output_dir):
+    # Lossy formats would destroy the payload, so images are written as PNG
+    name, ext = os.path.splitext(os.path.basename(carrier))
+    if ext.lower() in ('.jpg', '.jpeg'):
+        ext = '.png'
+    return os.path.join(output_dir, name + ext)
+
+
+def collect_jobs(args):
+    if args.manifest:
+        with open(args.manifest, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        return [(args.operation, args.method, args.mmap, args.key, args.format, row['carrier'],
+                 row.get('output') or (args.output and output_name(row['carrier'], args.output)),
+                 row.get('message') or args.message) for row in rows]
+    carriers = sorted(
+        os.path.join(args.input, name) for name in os.listdir(args.input)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS | AUDIO_EXTENSIONS)
+    return [(args.operation, args.method, args.mmap, args.key, args.format, carrier,
+             args.output and output_name(carrier, args.output), args.message) for carrier in carriers]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hide or reveal messages in many carriers at once.")
+    parser.add_argument("operation", choices=["hide", "unhide", "probe"])
+    parser.add_argument("input", nargs='?', help="directory of carriers (or use --manifest)")
+    parser.add_argument("--manifest", help="CSV file with carrier, output and message columns")
+    parser.add_argument("--output", help="output directory for hide")
+    parser.add_argument("--message", help="message to hide in every carrier")
+    parser.add_argument("--message-file", help="read the message to hide from a UTF-8 file")
+    parser.add_argument("--method", choices=["lsb", "pvd"], default="lsb",
+                        help="image method; audio always uses LSB")
+    parser.add_argument("--mmap", action="store_true", help="patch/read uncompressed carriers in place")
+    parser.add_argument("--key", help="scatter LSB messages in an order derived from this passphrase")
+    parser.add_argument("--format", choices=["header", "legacy"], default="header",
+                        help="message format: UTF-8 behind the payload header, or NUL-terminated legacy text")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunksize", type=int, default=16, help="jobs handed to a worker at a time")
+    parser.add_argument("--results", help="write extracted messages here as JSON lines (default stdout)")
+    args = parser.parse_args(argv)
+
+    if not args.input and not args.manifest:
+        parser.error("give a carrier directory or --manifest")
+    if args.operation == 'probe' and args.format == 'legacy':
+        parser.error("probe looks for the payload header; legacy messages have none")
+    if args.message_file:
+        with open(args.message_file, encoding='utf-8') as f:
+            args.message = f.read()
+    if args.operation == 'hide' and args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    jobs = collect_jobs(args)
+    if args.operation == 'hide' and any(not job[6] for job in jobs):
+        parser.error("hide needs --output or an output column")
+    if args.operation == 'hide' and any(job[7] is None for job in jobs):
+        parser.error("hide needs --message, --message-file or a message column")
+
+    results = open(args.results, 'w', encoding='utf-8') if args.results else sys.stdout
+    failures = 0
+    total_bytes = 0
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            for done, (carrier, error, result, size) in enumerate(
+                    pool.map(run_job, jobs, chunksize=args.chunksize), 1):
+                if error:
+                    failures += 1
+                    print(f"{carrier}: {error}", file=sys.stderr)
+                elif args.operation == 'unhide':
+                    results.write(json.dumps({'carrier': carrier, 'message': result}) + '\n')
+                elif args.operation == 'probe':
+                    results.write(json.dumps({'carrier': carrier, 'payload': result}) + '\n')
+                total_bytes += size
+                if done % 100 == 0 or done == len(jobs):
+                    elapsed = time.perf_counter() - start
+                    print(f"[{done}/{len(jobs)}] {done / elapsed:.1f} files/s", file=sys.stderr)
+    finally:
+        if results is not sys.stdout:
+            results.close()
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"{len(jobs) - failures} succeeded, {failures} failed in {elapsed:.2f}s "
+          f"({len(jobs) / elapsed:.1f} files/s, {total_bytes / elapsed / 1e6:.1f} MB/s)",
+          file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Compare the vectorized LSB and PVD engines against the original loops.
+
+Both engines are also checked for bit-identical output, so this doubles as
+the regression check for the stego formats.
+
+Usage: python benchmark.py [--width 1000] [--height 750] [--message-length 500] [--workers N]
+"""
+import argparse
+import os
+import time
+import numpy as np
+from operations import str_to_bin, bin_to_str, get_capacity
+from lsb import bytes_to_bits, embed_bits, extract_until_null
+from pvd import BLOCK_ROWS, embed_pvd, extract_pvd, read_pvd_bits, str_to_bits, bits_to_str
+
+
+# Reference implementations of the original HideImage / UnhideImage loops
+def legacy_embed_lsb(image, message):
+    binary_message = ''.join(format(ord(char), '08b') for char in message) + '00000000'
+    flat_image = image.flatten().astype(np.int16)
+    for i in range(len(binary_message)):
+        original_pixel = flat_image[i]
+        original_pixel &= ~1
+        original_pixel = np.clip(original_pixel, -32768, 32767)
+        modified_pixel = original_pixel | int(binary_message[i])
+        modified_pixel = np.clip(modified_pixel, -32768, 32767)
+        flat_image[i] = modified_pixel
+    return np.clip(flat_image, 0, 255).astype(np.uint8).reshape(image.shape)
+
+
+def legacy_extract_lsb(image):
+    flat_image = image.flatten()
+    binary_message = ''.join(str(flat_image[i] & 1) for i in range(len(flat_image)))
+    chars = [binary_message[i:i+8] for i in range(0, len(binary_message), 8)]
+    message = ''
+    for char in chars:
+        if char == '00000000':
+            break
+        message += chr(int(char, 2))
+    return message
+
+
+# Reference implementations of the original PVD pair loops
+def legacy_embed_pvd(image, secret_message):
+    pixels = image.astype(np.int32)
+    binary_msg = str_to_bin(secret_message)
+    binary_message = format(len(binary_msg), '032b') + binary_msg
+    binary_index = 0
+    rows, cols = pixels.shape[:2]
+    channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+    for channel in range(channels):
+        channel_data = pixels if channels == 1 else pixels[:, :, channel]
+        for row in range(rows):
+            for col in range(0, cols - 1, 2):
+                if binary_index >= len(binary_message):
+                    break
+                p1 = channel_data[row, col]
+                p2 = channel_data[row, col + 1]
+                bit_capacity = get_capacity(abs(p1 - p2))
+                bits_to_embed = binary_message[binary_index:binary_index + bit_capacity]
+                if not bits_to_embed:
+                    break
+                binary_index += bit_capacity
+                value_to_embed = int(bits_to_embed, 2)
+                if p1 > p2:
+                    p2 = max(0, p1 - value_to_embed)
+                else:
+                    p1 = max(0, p2 - value_to_embed)
+                channel_data[row, col], channel_data[row, col + 1] = min(255, p1), min(255, p2)
+    return np.uint8(np.clip(pixels, 0, 255))
+
+
+def legacy_extract_pvd(image):
+    pixels = image.astype(np.int32)
+    rows, cols = pixels.shape[:2]
+    channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+    binary_message = ''
+    length_bits_collected = 0
+    message_length = None
+    for channel in range(channels):
+        channel_data = pixels if channels == 1 else pixels[:, :, channel]
+        for row in range(rows):
+            for col in range(0, cols - 1, 2):
+                diff = abs(channel_data[row, col] - channel_data[row, col + 1])
+                bit_capacity = get_capacity(diff)
+                embedded_bits = format(diff, f'0{bit_capacity}b')
+                if message_length is None:
+                    needed = 32 - length_bits_collected
+                    if bit_capacity <= needed:
+                        length_bits_collected += bit_capacity
+                        binary_message += embedded_bits
+                    else:
+                        binary_message += embedded_bits[:needed]
+                        message_length = int(binary_message, 2)
+                        binary_message = embedded_bits[needed:]
+                        length_bits_collected = 32
+                        continue
+                    if length_bits_collected == 32:
+                        message_length = int(binary_message, 2)
+                        binary_message = ''
+                else:
+                    binary_message += embedded_bits
+                if message_length is not None and len(binary_message) >= message_length:
+                    return bin_to_str(binary_message[:message_length])
+    if message_length is not None:
+        return bin_to_str(binary_message[:message_length])
+    return ''
+
+
+def vectorized_embed_lsb(image, message):
+    stego = image.copy()
+    embed_bits(stego.reshape(-1), bytes_to_bits(message.encode('latin-1') + b'\x00'))
+    return stego
+
+
+def vectorized_extract_lsb(image):
+    return extract_until_null(image.reshape(-1)).decode('latin-1')
+
+
+def vectorized_embed_pvd(image, secret_message):
+    pixels = image.astype(np.int32)
+    binary_msg = str_to_bin(secret_message)
+    embed_pvd(pixels, str_to_bits(format(len(binary_msg), '032b') + binary_msg))
+    return np.uint8(np.clip(pixels, 0, 255))
+
+
+def vectorized_extract_pvd(image):
+    return bits_to_str(extract_pvd(image.astype(np.int32)))
+
+
+def embed_pvd_copy(pixels, bits, workers):
+    stego = pixels.copy()
+    embed_pvd(stego, bits, workers=workers)
+    return stego
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LSB and PVD engines against the original loops.")
+    parser.add_argument("--width", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=750)
+    parser.add_argument("--message-length", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="threads for the tiled PVD run")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    message = ''.join(chr(c) for c in rng.integers(32, 127, args.message_length))
+
+    results = []
+    for method, (legacy_embed, legacy_extract, embed, extract) in (
+            ("lsb", (legacy_embed_lsb, legacy_extract_lsb, vectorized_embed_lsb, vectorized_extract_lsb)),
+            ("pvd", (legacy_embed_pvd, legacy_extract_pvd, vectorized_embed_pvd, vectorized_extract_pvd))):
+        legacy_stego, legacy_embed_time = timed(legacy_embed, image, message)
+        stego, embed_time = timed(embed, image, message)
+        if not np.array_equal(legacy_stego, stego):
+            raise SystemExit(f"Vectorized {method} embedding differs from the original loop.")
+        legacy_text, legacy_extract_time = timed(legacy_extract, stego)
+        text, extract_time = timed(extract, stego)
+        if text != legacy_text:
+            raise SystemExit(f"Vectorized {method} extraction differs from the original loop.")
+        # The extraction loop must also agree on a carrier holding no message
+        if extract(image) != legacy_extract(image):
+            raise SystemExit(f"Vectorized {method} extraction differs on a clean carrier.")
+        results.append((f"{method} embed", legacy_embed_time, embed_time))
+        results.append((f"{method} extract", legacy_extract_time, extract_time))
+
+    print(f"Carrier: {args.width}x{args.height}x3, message: {args.message_length} chars")
+    print(f"{'step':<14}{'original (s)':>14}{'vectorized (s)':>16}{'speedup':>10}")
+    for step, old, new in results:
+        print(f"{step:<14}{old:>14.4f}{new:>16.6f}{old / new:>9.0f}x")
+
+    # Tiled PVD against the serial engine, with a message filling the image
+    smooth = np.clip(image // 8 + np.arange(args.width)[None, :, None] % 200, 0, 255).astype(np.int32)
+    bits = rng.integers(0, 2, 3 * args.width * args.height, dtype=np.uint8)
+    serial, embed_time = timed(embed_pvd_copy, smooth, bits, 1)
+    tiled, tiled_embed_time = timed(embed_pvd_copy, smooth, bits, args.workers)
+    if not np.array_equal(serial, tiled):
+        raise SystemExit("Tiled PVD embedding differs from the serial engine.")
+    stream, extract_time = timed(read_pvd_bits, serial, len(bits))
+    tiled_stream, tiled_extract_time = timed(read_pvd_bits, serial, len(bits), BLOCK_ROWS, args.workers)
+    if not np.array_equal(stream, tiled_stream):
+        raise SystemExit("Tiled PVD extraction differs from the serial engine.")
+    print(f"\nTiled PVD, {args.workers} workers, {len(stream)} bits")
+    print(f"{'step':<14}{'serial (s)':>14}{'tiled (s)':>16}{'speedup':>10}")
+    for step, old, new in (("pvd embed", embed_time, tiled_embed_time),
+                           ("pvd extract", extract_time, tiled_extract_time)):
+        print(f"{step:<14}{old:>14.4f}{new:>16.4f}{old / new:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for every hide/unhide method across carrier sizes.
+
+Carriers are synthesized locally: grayscale and RGB images from 256x256 up
+to 8K, and 8/16-bit mono and stereo WAV files from one second up to an hour.
+embed_text_lsb, embed_text_pvd, extract_text_lsb and extract_text_pvd are
+timed on the image and audio classes for each payload size. Each case runs
+in a fresh worker process so its peak RSS can be reported on its own.
+
+Image carriers are decoded once and cached (carrier.py), and embedding
+caches its output. The cache is cleared before every timed run so each run
+includes the PNG decode. --warm keeps it, to time the cached path; those
+cases are named .../warm so baselines never mix the two.
+
+    python benchmark_suite.py --preset quick --output results.json
+    python benchmark_suite.py --preset full --output new.json --baseline results.json
+
+With --baseline, cases whose median latency grew by more than --threshold
+are listed and the exit status is 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from carrier import clear_cache
+from hide import HideImage, HideAudio
+from unhide import UnhideImage, UnhideAudio
+
+PRESETS = {
+    'quick': {
+        'images': [(256, 256), (1024, 1024)],
+        'audio': [1, 60],
+        'payloads': [16, 1024],
+    },
+    'full': {
+        'images': [(256, 256), (1024, 1024), (1920, 1080), (3840, 2160), (7680, 4320)],
+        'audio': [1, 60, 600, 3600],
+        'payloads': [16, 1024, 65536],
+    },
+}
+
+SAMPLE_RATE = 44100
+
+IMAGE_OPERATIONS = ['embed_text_lsb', 'extract_text_lsb', 'embed_text_pvd', 'extract_text_pvd']
+AUDIO_OPERATIONS = ['embed_text_lsb', 'extract_text_lsb']
+
+
+def make_image(path, width, height, channels, rng):
+    # Smooth gradient plus a little noise, like a photo
+    gradient = np.add.outer(np.arange(height) * 200 // max(height, 1), np.arange(width) * 55 // max(width, 1))
+    noise = rng.integers(0, 8, (height, width, channels))
+    image = np.clip(gradient[:, :, None] + noise, 0, 255).astype(np.uint8)
+    cv2.imwrite(path, image if channels == 3 else image[:, :, 0])
+
+
+def make_audio(path, seconds, sampwidth, channels, rng):
+    # Noise written a second at a time so long files never sit in memory
+    with wave.open(path, 'wb') as audio:
+        audio.setnchannels(channels)
+        audio.setsampwidth(sampwidth)
+        audio.setframerate(SAMPLE_RATE)
+        for _ in range(seconds):
+            audio.writeframesraw(rng.integers(0, 256, SAMPLE_RATE * channels * sampwidth, dtype=np.uint8).tobytes())
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(case):
+    # Worker: time one operation on one carrier, return latencies and peak RSS
+    kind, carrier, operation, payload, repeat, workdir, warm = case
+    message = ('steganography ' * (payload // 14 + 1))[:payload]
+    output = os.path.join(workdir, f"out_{os.getpid()}" + os.path.splitext(carrier)[1])
+    method = operation.rsplit('_', 1)[1]
+    if kind == 'image':
+        hide, unhide = HideImage(carrier, output), UnhideImage(output)
+    else:
+        hide, unhide = HideAudio(carrier, output), UnhideAudio(output)
+    latencies = []
+    # HideAudio prints a line per embed; keep it out of the report
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if operation.startswith('extract'):
+                getattr(hide, f'embed_text_{method}')(message)
+                target = getattr(unhide, operation)
+            else:
+                target = getattr(hide, operation)
+            for _ in range(repeat):
+                if not warm:
+                    clear_cache()
+                start = time.perf_counter()
+                if operation.startswith('extract'):
+                    target()
+                else:
+                    target(message)
+                latencies.append(time.perf_counter() - start)
+    except ValueError as e:
+        return None, str(e), peak_rss_mb()
+    finally:
+        if os.path.exists(output):
+            os.remove(output)
+    return latencies, None, peak_rss_mb()
+
+
+def summarize(latencies, carrier_bytes, payload):
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {
+        'p50_s': p50,
+        'p90_s': p90,
+        'p99_s': p99,
+        'mean_s': float(np.mean(latencies)),
+        'carrier_mb_per_s': carrier_bytes / p50 / 1e6,
+        'payload_kb_per_s': payload / p50 / 1e3,
+    }
+
+
+def build_carriers(preset, workdir, rng):
+    carriers = []
+    for width, height in preset['images']:
+        for channels in (1, 3):
+            path = os.path.join(workdir, f"image_{width}x{height}x{channels}.png")
+            make_image(path, width, height, channels, rng)
+            carriers.append(('image', path, f"{width}x{height}x{channels}"))
+    for seconds in preset['audio']:
+        for sampwidth in (1, 2):
+            for channels in (1, 2):
+                path = os.path.join(workdir, f"audio_{seconds}s_{8 * sampwidth}bit_{channels}ch.wav")
+                make_audio(path, seconds, sampwidth, channels, rng)
+                carriers.append(('audio', path, f"{seconds}s/{8 * sampwidth}bit/{channels}ch"))
+    return carriers
+
+
+def compare(results, baseline_path, threshold):
+    # Print cases that got slower than the baseline; return how many did
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {result['case']: result for result in json.load(f)['results'] if 'p50_s' in result}
+    regressions = 0
+    for result in results:
+        before = baseline.get(result['case'])
+        if before is None or 'p50_s' not in result:
+            continue
+        ratio = result['p50_s'] / before['p50_s']
+        if ratio > 1 + threshold:
+            regressions += 1
+            print(f"REGRESSION {result['case']}: {before['p50_s']:.6f}s -> {result['p50_s']:.6f}s ({ratio:.2f}x)")
+    print(f"{regressions} regression(s) against {baseline_path}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every hide/unhide method across carrier sizes.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--payloads", type=int, nargs='+', help="payload sizes in bytes (overrides the preset)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a previous results file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed median slowdown (0.10 = 10%%)")
+    parser.add_argument("--warm", action="store_true", help="keep decoded images cached between timed runs")
+    args = parser.parse_args()
+
+    preset = dict(PRESETS[args.preset])
+    if args.payloads:
+        preset['payloads'] = args.payloads
+    rng = np.random.default_rng(0)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        carriers = build_carriers(preset, workdir, rng)
+        # One process per case, so ru_maxrss is that case's peak
+        with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+            for kind, path, label in carriers:
+                operations = IMAGE_OPERATIONS if kind == 'image' else AUDIO_OPERATIONS
+                for payload in preset['payloads']:
+                    for operation in operations:
+                        case = f"{kind}/{label}/{operation}/{payload}B" + ("/warm" if args.warm else "")
+                        latencies, error, rss = pool.submit(
+                            run_case, (kind, path, operation, payload, args.repeat, workdir, args.warm)).result()
+                        result = {'case': case, 'kind': kind, 'carrier': label, 'operation': operation,
+                                  'payload_bytes': payload, 'peak_rss_mb': rss}
+                        if error:
+                            result['skipped'] = error
+                            print(f"{case:<55} skipped: {error}")
+                        else:
+                            result.update(summarize(latencies, os.path.getsize(path), payload))
+                            print(f"{case:<55} p50 {result['p50_s']:.6f}s  p99 {result['p99_s']:.6f}s  "
+                                  f"{result['carrier_mb_per_s']:8.1f} MB/s  rss {rss:7.1f} MB")
+                        results.append(result)
+
+    report = {
+        'meta': {
+            'preset': args.preset,
+            'repeat': args.repeat,
+            'cache': 'warm' if args.warm else 'cold',
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline and compare(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
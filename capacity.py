@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Payload capacity of carriers, without a trial embed.
+
+Capacities are reported in bytes of data that embed_bytes can take
+(uncompressed, after the payload header). Image capacities are cached under
+the key of the decoded carrier (see carrier.py), so asking again for the
+same image is a dictionary hit. Audio capacities come straight from the WAV
+header and are not cached.
+"""
+import threading
+from collections import OrderedDict
+from carrier import decode_image, rgb_view
+from pvd import pvd_capacity
+from payload import HEADER, LSB_WIDTHS
+from rawio import mapped_carrier
+from wavio import open_wave
+
+# Carriers whose capacities are remembered
+CACHE_SIZE = 1024
+
+_cache = OrderedDict()
+# Sessions of a threaded server (Streamlit) share the cache
+_lock = threading.Lock()
+
+
+def cached(key, compute):
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return dict(_cache[key])
+    # Computed outside the lock; two sessions may both compute a new key
+    result = compute()
+    with _lock:
+        _cache[key] = result
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(result)
+
+
+def payload_bytes(bits):
+    # Data bytes that fit in a carrier holding bits, after the header
+    return max(0, bits // 8 - HEADER.size)
+
+
+def lsb_capacity(units):
+    # {'lsb': ..., 'lsb2': ..., ...} for a carrier with this many LSB values;
+    # the header always takes one bit per value
+    free = max(0, units - HEADER.size * 8)
+    return {'lsb' if width == 1 else f'lsb{width}': free * width // 8 for width in LSB_WIDTHS}
+
+
+def image_capacity(source, use_mmap=False):
+    # {'lsb': bytes, 'lsb2': bytes, 'lsb3': bytes, 'lsb4': bytes, 'pvd': bytes}
+    # for an image path, encoded buffer or decoded array (see carrier.py)
+    key, pixels, _ = decode_image(source)
+    def compute():
+        if use_mmap:
+            with mapped_carrier(source) as view:
+                lsb_units = view.size
+        else:
+            # LSB always works on three 8-bit channels
+            lsb_units = pixels.shape[0] * pixels.shape[1] * 3
+        return dict(lsb_capacity(lsb_units), pvd=payload_bytes(pvd_capacity(rgb_view(pixels))))
+    return cached((key, 'image', use_mmap), compute)
+
+
+def audio_capacity(source, use_mmap=False):
+    # {'lsb': bytes, 'lsb2': bytes, ...} for a WAV file; embed_bytes uses
+    # the low byte of each sample, mapped or not. Only the header is read,
+    # so there is nothing worth caching.
+    with open_wave(source) as audio:
+        params = audio.getparams()
+    return lsb_capacity(params.nframes * params.nchannels)
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Decode-once image carriers.
+
+load_image() decodes a path, encoded bytes or a file-like object once with
+OpenCV and keeps the pixels in an LRU cache keyed by a hash of the encoded
+content, bounded by CACHE_BYTES of decoded pixels. Capacity checks, embedding,
+previews and verification of the same carrier then share a single decode.
+Cached arrays are read-only; embedding works on a copy.
+load_top_rows() is for probes: it decodes only the top rows of a PNG and
+neither hashes nor caches the carrier.
+
+Pixels are kept as cv2.IMREAD_UNCHANGED decodes them (2-D gray, or BGR/BGRA
+channels), reduced to 8 bits and as stored, along with the EXIF orientation
+of the file. Arrays passed in directly must use the same layout. The two
+methods keep the layouts they have always worked on. LSB uses
+load_upright() and lsb_view(): three BGR channels turned upright, as
+cv2.imread returns them. PVD uses load_image() and pvd_pixels(): the
+image's own channels in RGB order, as stored, as PIL returns them.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from PIL import Image
+from metrics import count, stage
+
+# Decoded pixels kept across calls, in bytes
+CACHE_BYTES = 512 << 20
+
+# Output formats that decode back to exactly the pixels written
+LOSSLESS_EXTENSIONS = {'.png', '.bmp', '.ppm', '.pgm', '.pnm', '.tif', '.tiff'}
+
+# EXIF orientation tag, and the (transpose, flip rows, flip columns) that
+# cv2.imread applies for each of its values
+ORIENTATION_TAG = 0x0112
+ORIENTATIONS = {
+    1: (False, False, False),
+    2: (False, False, True),
+    3: (False, True, True),
+    4: (False, True, False),
+    5: (True, False, False),
+    6: (True, False, True),
+    7: (True, True, True),
+    8: (True, True, False),
+}
+
+# content key -> (pixels, EXIF orientation)
+_cache = OrderedDict()
+_cached_bytes = 0
+# Sessions of a threaded server (Streamlit) share the cache
+_lock = threading.Lock()
+
+
+def read_source(source):
+    # Encoded bytes of a path, bytes-like object or file-like object;
+    # seekable file objects are read from the start every time, as
+    # wavio.open_wave does, so one object serves several operations
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = source
+    elif hasattr(source, 'getvalue'):
+        data = source.getvalue()
+    elif hasattr(source, 'read'):
+        if getattr(source, 'seekable', lambda: False)():
+            source.seek(0)
+        data = source.read()
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+    if not len(data):
+        raise ValueError("Carrier is empty (or a file object that was already read).")
+    return data
+
+
+def content_key(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def array_key(pixels):
+    # Key for an array passed in directly, from its bytes and layout
+    digest = hashlib.blake2b(np.ascontiguousarray(pixels), digest_size=16)
+    digest.update(f"{pixels.shape}{pixels.dtype.str}".encode())
+    return digest.digest()
+
+
+def header_orientation(image):
+    # EXIF orientation recorded in the header of an opened PIL image, 1 if none
+    exif = image.info.get('exif')
+    if not exif:
+        return 1
+    tags = Image.Exif()
+    tags.load(exif)
+    return tags.get(ORIENTATION_TAG, 1)
+
+
+def exif_orientation(data):
+    # EXIF orientation of encoded image data, 1 if it records none. PIL only
+    # parses the header here; files it cannot read carry no orientation.
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return header_orientation(image)
+    except Exception:
+        return 1
+
+
+def orient(pixels, orientation):
+    # View of stored pixels turned upright for an EXIF orientation
+    transpose, flip_rows, flip_cols = ORIENTATIONS.get(orientation, ORIENTATIONS[1])
+    if transpose:
+        pixels = pixels.swapaxes(0, 1)
+    return pixels[::-1 if flip_rows else 1, ::-1 if flip_cols else 1]
+
+
+def remember(key, pixels, orientation=1):
+    # Cache pixels under key, evicting the least recently used past the budget
+    global _cached_bytes
+    if pixels.nbytes > CACHE_BYTES:
+        return
+    pixels.flags.writeable = False
+    with _lock:
+        if key in _cache:
+            _cached_bytes -= _cache.pop(key)[0].nbytes
+        _cache[key] = pixels, orientation
+        _cached_bytes += pixels.nbytes
+        while _cached_bytes > CACHE_BYTES:
+            _cached_bytes -= _cache.popitem(last=False)[1][0].nbytes
+
+
+def clear_cache():
+    # Forget every decoded carrier, so the next load decodes again
+    global _cached_bytes
+    with _lock:
+        _cache.clear()
+        _cached_bytes = 0
+
+
+def decode_image(source):
+    # Return (content key, pixels as stored, EXIF orientation) for source,
+    # decoding only on a cache miss
+    if isinstance(source, np.ndarray):
+        return array_key(source), source, 1
+    with stage('read'):
+        data = read_source(source)
+    count('bytes_read', len(data))
+    with stage('hash'):
+        key = content_key(data)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+    if entry is not None:
+        count('cache_hits', 1)
+        return (key,) + entry
+    pixels, orientation = decode_pixels(data)
+    remember(key, pixels, orientation)
+    return key, pixels, orientation
+
+
+def decode_pixels(data):
+    # Decode encoded image data to (pixels as stored, EXIF orientation)
+    with stage('decode'):
+        pixels = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if pixels is None:
+            raise ValueError("Image not found or not a supported image format.")
+        if pixels.dtype == np.uint16:
+            # Keep the high byte, as cv2.imread does for 16-bit images
+            pixels = (pixels >> 8).astype(np.uint8)
+        orientation = exif_orientation(data)
+    count('pixels', pixels.shape[0] * pixels.shape[1])
+    return pixels, orientation
+
+
+def load_image(source):
+    # Decoded pixels of source as stored; arrays are returned as they are
+    if isinstance(source, np.ndarray):
+        return source
+    return decode_image(source)[1]
+
+
+def load_upright(source):
+    # Decoded pixels of source turned upright by their EXIF orientation, as
+    # cv2.imread returns them; arrays are returned as they are
+    _, pixels, orientation = decode_image(source)
+    return orient(pixels, orientation)
+
+
+def load_top_rows(source, units):
+    # The top rows of source as load_upright returns them, enough to hold
+    # units LSB values (three per pixel). 8-bit, non-interlaced PNG files
+    # stored upright are decoded no further than those rows; other images
+    # are decoded whole. Nothing is hashed or cached, so looking at many
+    # carriers once costs no more than that.
+    if isinstance(source, np.ndarray):
+        return source[:-(-units // (source.shape[1] * 3))]
+    # Paths are opened directly, so PIL reads no more of the file than it decodes
+    data = None if isinstance(source, (str, os.PathLike)) else read_source(source)
+    try:
+        with Image.open(source if data is None else io.BytesIO(data)) as image:
+            pixels = png_top_rows(image, units)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        # Not a file PIL can read; OpenCV may still decode it
+        pixels = None
+    if pixels is None:
+        pixels = orient(*decode_pixels(read_source(source) if data is None else data))
+        pixels = pixels[:-(-units // (pixels.shape[1] * 3))]
+    return pixels
+
+
+def png_top_rows(image, units):
+    # Decode just the top rows of an opened PNG holding units LSB values, in
+    # BGR(A) order; None if the file needs a full decode
+    if image.format != 'PNG' or len(image.tile) != 1 or image.info.get('interlace'):
+        return None
+    codec, _, offset, rawmode = image.tile[0]
+    if rawmode not in ('L', 'RGB', 'RGBA') or header_orientation(image) != 1:
+        return None
+    width = image.size[0]
+    rows = min(-(-units // (width * 3)), image.size[1])
+    with stage('decode'):
+        # A shorter tile stops the decoder after its rows; the chunks after
+        # the image data are not read
+        image.tile = [(codec, (0, 0, width, rows), offset, rawmode)]
+        image._size = (width, rows)
+        image.load_end = lambda: None
+        image.load()
+        pixels = swap_red_blue(np.asarray(image))
+    count('pixels', width * rows)
+    return pixels
+
+
+def save_image(output, pixels):
+    # Encode pixels to a path, in the format of its extension, or to a
+    # writable file-like object, as PNG unless its name says otherwise.
+    # Lossless outputs are cached as written, so reading them back (preview,
+    # verify) skips the decode; pixels must not be modified afterwards.
+    name = getattr(output, 'name', '') if hasattr(output, 'write') else os.fspath(output)
+    extension = (os.path.splitext(name)[1].lower() if isinstance(name, str) else '') or '.png'
+    with stage('encode'):
+        ok, encoded = cv2.imencode(extension, pixels)
+    if not ok:
+        raise ValueError(f"Could not encode the image as {extension}.")
+    with stage('write'):
+        if hasattr(output, 'write'):
+            output.write(encoded)
+        else:
+            with open(output, 'wb') as f:
+                f.write(encoded)
+    count('bytes_written', encoded.size)
+    if extension in LOSSLESS_EXTENSIONS:
+        remember(content_key(encoded), pixels)
+
+
+def lsb_view(pixels, writable=False):
+    # Three contiguous BGR channels; writable returns an array that can be
+    # modified without touching pixels
+    if pixels.ndim == 2:
+        return cv2.cvtColor(np.ascontiguousarray(pixels), cv2.COLOR_GRAY2BGR)
+    if pixels.shape[2] == 3:
+        return pixels.copy() if writable else np.ascontiguousarray(pixels)
+    return np.ascontiguousarray(pixels[:, :, :3])
+
+
+def swap_red_blue(pixels):
+    # BGR(A) <-> RGB(A); gray images are returned as they are
+    if pixels.ndim == 2 or pixels.shape[2] < 3:
+        return pixels
+    return pixels[:, :, [2, 1, 0] + list(range(3, pixels.shape[2]))]
+
+
+def rgb_view(pixels):
+    # RGB(A) channel order, without a copy for gray and 3-channel images
+    if pixels.ndim == 3 and pixels.shape[2] == 3:
+        return pixels[:, :, ::-1]
+    return swap_red_blue(pixels)
+
+
+def pvd_pixels(pixels):
+    # A new int32 array of the image's channels in RGB order, for PVD
+    with stage('convert'):
+        return swap_red_blue(pixels).astype(np.int32)
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
+import io
+from collections import deque
 import streamlit as st
 from hide import HideImage, HideAudio
 from unhide import UnhideImage, UnhideAudio
-import os
+from carrier import load_image
+from metrics import recording
 
 # -------------------------------
 # Configuration
@@ -15,6 +18,32 @@ st.set_page_config(page_title="Steganography Assistant", layout="wide")
 st.title("🔐 Steganography Assistant".encode("utf-8", "ignore").decode("utf-8"))
 st.caption("Securely hide and reveal messages in image or audio files using steganography.")
 
+# -------------------------------
+# In-memory carriers
+# -------------------------------
+# Uploads are never written to disk: carriers are decoded from the uploaded
+# bytes and results are built in BytesIO buffers, so sessions do not share
+# files. Decoded images are cached across reruns and sessions.
+@st.cache_data(max_entries=32, show_spinner=False)
+def decoded_carrier(data):
+    return load_image(data)
+
+# -------------------------------
+# Metrics
+# -------------------------------
+# Calls made in this session are recorded (see metrics.py) and summarized
+# in the sidebar. Only the calls shown there are kept. Memory tracing is
+# opt-in: it slows every allocation in the server process while a traced
+# call runs.
+SHOWN_CALLS = 5
+if "call_metrics" not in st.session_state:
+    st.session_state.call_metrics = deque(maxlen=SHOWN_CALLS)
+trace_memory = st.sidebar.checkbox("Trace peak memory (slower)", value=False)
+
+
+def measured_session():
+    return recording(st.session_state.call_metrics.append, trace_memory=trace_memory)
+
 # -------------------------------
 # Chat Start
 # -------------------------------
@@ -42,25 +71,25 @@ if process:
                 uploaded_img = st.file_uploader("Supported formats: PNG, JPG, JPEG", type=["png", "jpg", "jpeg"])
 
             if uploaded_img:
-                original_path = "temp_uploaded_image.png"
-                with open(original_path, "wb") as f:
-                    f.write(uploaded_img.getbuffer())
+                original = uploaded_img.getvalue()
 
                 with col2:
                     message = st.text_area("Type the secret message:", height=120)
-                    output_path = "encoded_image.png"
                     if st.button("Hide Message in Image"):
                         try:
-                            stego_img = HideImage(original_path, output_path)
-                            stego_img.embed_text_pvd(message)
+                            output = io.BytesIO()
+                            stego_img = HideImage(decoded_carrier(original), output)
+                            with measured_session():
+                                stego_img.embed_text_pvd(message)
+                            encoded = output.getvalue()
                             st.success("✅ Message embedded successfully.")
                             img_col1, img_col2 = st.columns(2)
                             with img_col1:
-                                st.image(original_path, caption="Original Image", use_column_width=True)
+                                st.image(original, caption="Original Image", use_column_width=True)
                             with img_col2:
-                                st.image(output_path, caption="Stego Image", use_column_width=True)
-                            with open(output_path, "rb") as f:
-                                st.download_button("⬇️ Download Encoded Image", f, file_name="stego_image.png")
+                                st.image(encoded, caption="Stego Image", use_column_width=True)
+                            st.download_button("⬇️ Download Encoded Image", encoded, file_name="stego_image.png",
+                                               mime="image/png")
                             st.caption("💾 The file will be saved to your **Downloads** folder.")
                             st.subheader("📤 Share with Friends")
                             col_share1, col_share2 = st.columns(2)
@@ -83,22 +112,20 @@ if process:
                 uploaded_audio = st.file_uploader("Supported formats: WAV", type=["wav"])
 
             if uploaded_audio:
-                original_audio_path = "temp_uploaded_audio.wav"
-                with open(original_audio_path, "wb") as f:
-                    f.write(uploaded_audio.getbuffer())
-
                 with col2:
                     st.subheader("✉️ Enter Your Secret Message")
                     message = st.text_area("Type the secret message:", height=120)
-                    output_path = "encoded_audio.wav"
                     if st.button("Hide Message in Audio"):
                         try:
-                            stego_audio = HideAudio(original_audio_path, output_path)
-                            stego_audio.embed_text_lsb(message)
+                            output = io.BytesIO()
+                            stego_audio = HideAudio(uploaded_audio.getvalue(), output)
+                            with measured_session():
+                                stego_audio.embed_text_lsb(message)
+                            encoded = output.getvalue()
                             st.success("✅ Message successfully embedded into the audio.")
-                            st.audio(output_path, format="audio/wav")
-                            with open(output_path, "rb") as f:
-                                st.download_button("⬇️ Download Encoded Audio", f, file_name="stego_audio.wav")
+                            st.audio(encoded, format="audio/wav")
+                            st.download_button("⬇️ Download Encoded Audio", encoded, file_name="stego_audio.wav",
+                                               mime="audio/wav")
                             st.caption("💾 File saved as `stego_audio.wav`.")
                             st.subheader("📤 Share with Friends")
                             col_share1, col_share2 = st.columns(2)
@@ -130,8 +157,9 @@ if process:
                     st.image(uploaded_img, caption="Uploaded Image", use_column_width=True)
                     if st.button("Reveal Message from Image"):
                         try:
-                            extract_img = UnhideImage(uploaded_img)
-                            hidden_message = extract_img.extract_text_pvd()
+                            extract_img = UnhideImage(decoded_carrier(uploaded_img.getvalue()))
+                            with measured_session():
+                                hidden_message = extract_img.extract_text_pvd()
                             with st.chat_message("assistant"):
                                 st.subheader("🕵️ Extracted Message")
                                 lines = hidden_message.count('\n') + 1
@@ -149,8 +177,9 @@ if process:
                     st.audio(uploaded_audio, format="audio/wav")
                     if st.button("Reveal Message from Audio"):
                         try:
-                            extract_audio = UnhideAudio(uploaded_audio)
-                            hidden_message = extract_audio.extract_text_lsb()
+                            extract_audio = UnhideAudio(uploaded_audio.getvalue())
+                            with measured_session():
+                                hidden_message = extract_audio.extract_text_lsb()
                             with st.chat_message("assistant"):
                                 st.subheader("🕵️ Extracted Message")
                                 lines = hidden_message.count('\n') + 1
@@ -158,6 +187,25 @@ if process:
                         except Exception as e:
                             st.error(f"❌ Failed to extract message: {e}")
 
+# -------------------------------
+# Sidebar Metrics Summary
+# -------------------------------
+with st.sidebar:
+    st.subheader("⏱️ Performance")
+    calls = st.session_state.call_metrics
+    if not calls:
+        st.caption("Hide or reveal a message to see where the time goes.")
+    for call in reversed(calls):
+        st.markdown(f"**{call['operation']}** · {call['wall_s'] * 1000:.1f} ms")
+        rows = {f"{name} (ms)": seconds * 1000 for name, seconds in call['stages'].items()}
+        rows.update(call['counters'])
+        if 'peak_bytes' in call:
+            shared = " (shared)" if call.get('peak_shared') else ""
+            rows[f"peak memory{shared} (MB)"] = call['peak_bytes'] / 1e6
+        st.table({"value": rows})
+        if call['error']:
+            st.caption(f"Failed: {call['error']}")
+
 # -------------------------------
 # Footer and Notes
 # -------------------------------
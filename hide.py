@@ -1,137 +1,215 @@
-import wave
-import cv2
 from PIL import Image
 import numpy as np
-from operations import str_to_bin, get_capacity
+from operations import str_to_bin
+from lsb import bytes_to_bits, payload_units, write_payload, embed_payload, scatter_writes, write_scattered
+from pvd import embed_pvd, embed_ranged, str_to_bits
+from wavio import CHUNK_FRAMES, open_wave, iter_frames, copy_frames, write_frames
+from rawio import copy_carrier, mapped_carrier
+from carrier import load_image, load_upright, save_image, lsb_view, pvd_pixels, swap_red_blue
+from payload import pack_payload
+from capacity import image_capacity, audio_capacity
+from scatter import keyed_order
+from metrics import count, instrument, stage
 
+@instrument
 class HideImage:
-    def __init__(self, image_path, output_path):
+    # image_path may also be encoded image bytes, a file-like object or a
+    # decoded array (see carrier.load_image); the carrier is decoded once and
+    # cached, so repeated operations on it skip the decode. output_path may
+    # be a writable file-like object such as BytesIO (PNG unless it has a
+    # name with another extension).
+    # use_mmap: patch uncompressed carriers (BMP, PPM/PGM) in place through a
+    # memory map instead of rewriting the whole file. Applies to LSB embedding;
+    # pass the same path twice to skip the initial copy.
+    # workers: threads embedding PVD row tiles in parallel (same output)
+    def __init__(self, image_path, output_path, use_mmap=False, workers=1):
         self.image_path = image_path
         self.output_path = output_path
+        self.use_mmap = use_mmap
+        self.workers = workers
 
-    def embed_text_lsb(self, message):
+    def embed_text_lsb(self, message, key=None):
+        # key: scatter the message over the image in an order derived from
+        # this passphrase instead of filling it from the start
         try:
-            image = cv2.imread(self.image_path)
-            if image is None:
-                raise ValueError("Image not found. Check the path.")
-            binary_message = ''.join(format(ord(char), '08b') for char in message) + '00000000'
-            message_len = len(binary_message)
-            flat_image = image.flatten().astype(np.int16)
-            if message_len > len(flat_image):
-                raise ValueError("Message is too long to fit in the image.")
-            for i in range(message_len):
-                original_pixel = flat_image[i]
-                original_pixel &= ~1
-                original_pixel = np.clip(original_pixel, -32768, 32767)
-                message_bit = int(binary_message[i])
-                modified_pixel = original_pixel | message_bit
-                modified_pixel = np.clip(modified_pixel, -32768, 32767)
-                flat_image[i] = modified_pixel
-            flat_image = np.clip(flat_image, 0, 255).astype(np.uint8)
-            stego_image = flat_image.reshape(image.shape)
-            cv2.imwrite(self.output_path, stego_image)
+            self._embed_lsb(b'', message.encode('latin-1') + b'\x00', key=key)
         except Exception as e:
             raise ValueError(f"Error embedding text: {e}") 
 
+    def embed_bytes(self, data, method='lsb', codec='none', lsb_bits=1, key=None):
+        # Embed bytes (or a memoryview) behind a header recording the length,
+        # method, codec and format version. codec compresses the data first:
+        # 'zlib', 'bz2', 'lzma', or 'auto' for whichever is smallest.
+        # lsb_bits (1-4) is how many low bits of each channel value LSB uses.
+        # key scatters an LSB payload in a keyed order; extraction needs it.
+        try:
+            with stage('pack'):
+                header, stored = pack_payload(data, method, codec, lsb_bits)
+            if method == 'lsb':
+                self._embed_lsb(header, stored, lsb_bits, key)
+                return
+            if key is not None:
+                raise ValueError("Keyed scattering is only available for LSB.")
+            pixels = pvd_pixels(load_image(self.image_path))
+            bits = np.concatenate([bytes_to_bits(header), bytes_to_bits(stored)])
+            with stage('embed'):
+                placed = embed_ranged(pixels, bits, workers=self.workers)
+            if placed < len(bits):
+                raise ValueError("Message is too long to fit in the image.")
+            save_image(self.output_path, swap_red_blue(np.uint8(np.clip(pixels, 0, 255))))
+        except Exception as e:
+            raise ValueError(f"Error embedding data: {e}")
+
+    def embed_text(self, message, method='lsb', codec='none', lsb_bits=1, key=None):
+        # UTF-8 text on top of embed_bytes
+        self.embed_bytes(message.encode('utf-8'), method, codec, lsb_bits, key)
+
+    def capacity(self):
+        # Largest payload in bytes embed_bytes can take per method, without
+        # compression: {'lsb': ..., 'lsb2': ..., 'lsb3': ..., 'lsb4': ...,
+        # 'pvd': ...}, where lsbK is LSB with lsb_bits=K. Cached per image content.
+        return image_capacity(self.image_path, self.use_mmap)
+
+    def _embed_lsb(self, header, data, width=1, key=None):
+        # Write the header and data into the image's low bits (see
+        # lsb.write_payload), in place when use_mmap is set, and scattered
+        # in keyed order when key is given
+        if self.use_mmap:
+            copy_carrier(self.image_path, self.output_path)
+            with mapped_carrier(self.output_path, writable=True) as pixels:
+                if payload_units(header, data, width) > pixels.size:
+                    raise ValueError("Message is too long to fit in the image.")
+                count('values', payload_units(header, data, width))
+                with stage('embed'):
+                    embed_payload(pixels, header, data, width, keyed_order(pixels.size, key))
+            return
+        image = lsb_view(load_upright(self.image_path), writable=True)
+        if payload_units(header, data, width) > image.size:
+            raise ValueError("Message is too long to fit in the image.")
+        count('values', payload_units(header, data, width))
+        # reshape returns a view, so the bits land directly in the image
+        with stage('embed'):
+            embed_payload(image.reshape(-1), header, data, width, keyed_order(image.size, key))
+        save_image(self.output_path, image)
+
     def get_stego_image(self):
-        # Return the stego image as a PIL Image object
-        return Image.open(self.output_path)
+        # Return the stego image as a PIL Image object; lossless outputs come
+        # from the cache rather than being decoded again
+        return Image.fromarray(swap_red_blue(load_image(self.output_path)))
 
     # Function to encode a message into an image using PVD
     def embed_text_pvd(self, secret_message):
         # Load the image
-        image = Image.open(self.image_path)
-        pixels = np.array(image, dtype=np.int32)
+        pixels = pvd_pixels(load_image(self.image_path))
     
         binary_msg = str_to_bin(secret_message)
         length_prefix = format(len(binary_msg), '032b')
         binary_message = length_prefix + binary_msg
 
-        binary_index = 0
-    
-        # Determine image dimensions
-        if len(pixels.shape) == 2:  # Grayscale image
-            rows, cols = pixels.shape
-            channels = 1
-        else:  # Color image
-            rows, cols, channels = pixels.shape
-    
-        for channel in range(channels):
-            channel_data = pixels if channels == 1 else pixels[:, :, channel]
-    
-            for row in range(rows):
-                for col in range(0, cols - 1, 2):
-                    if binary_index >= len(binary_message):
-                        break
-    
-                    # Get the pixel pair
-                    p1 = channel_data[row, col]
-                    p2 = channel_data[row, col + 1]
-    
-                    # Calculate the difference between pixel values
-                    diff = abs(p1 - p2)
-    
-                    # Determine embedding capacity
-                    bit_capacity = get_capacity(diff)
-    
-                    # Extract bits to embed
-                    bits_to_embed = binary_message[binary_index:binary_index + bit_capacity]
-                    if not bits_to_embed:
-                        break
-                    binary_index += bit_capacity
-    
-                    # Embed the bits into the pixel pair
-                    value_to_embed = int(bits_to_embed, 2)
-    
-                    if p1 > p2:
-                        p2 = max(0, p1 - value_to_embed)
-                    else:
-                        p1 = max(0, p2 - value_to_embed)
-    
-                    # Clip pixel values to the valid range [0, 255]
-                    p1 = min(255, max(0, p1))
-                    p2 = min(255, max(0, p2))
-    
-                    # Update pixel pair
-                    channel_data[row, col], channel_data[row, col + 1] = p1, p2
-    
-            # Save the updated channel back
-            if channels > 1:
-                pixels[:, :, channel] = channel_data
+        # Embed row block by row block; pairs past the message are untouched
+        with stage('embed'):
+            embed_pvd(pixels, str_to_bits(binary_message), workers=self.workers)
     
         # Convert pixel values back to uint8 for image creation
         pixels = np.uint8(np.clip(pixels, 0, 255))
     
         # Save the stego image
-        stego_image = Image.fromarray(pixels)
-        stego_image.save(self.output_path)
+        save_image(self.output_path, swap_red_blue(pixels))
 
 
+@instrument
 class HideAudio:
-    def __init__(self, audio_path, output_path):
+    # audio_path may be a path, a file-like object or a bytes buffer, and
+    # output_path a path or a writable file-like object such as BytesIO.
+    # use_mmap: patch PCM WAV files in place through a memory map instead of
+    # streaming every frame to a new file
+    def __init__(self, audio_path, output_path, chunk_frames=CHUNK_FRAMES, use_mmap=False):
         self.audio_path = audio_path
         self.output_path = output_path
+        self.chunk_frames = chunk_frames
+        self.use_mmap = use_mmap
 
     def text_to_bits(self, text):
         return ''.join(format(ord(char), '08b') for char in text) + '00000000'
 
-    def embed_text_lsb(self, message):
+    def embed_text_lsb(self, message, key=None):
+        # key: scatter the message over the samples in an order derived from
+        # this passphrase instead of filling them from the start
         try:
-            with wave.open(self.audio_path, 'rb') as audio:
-                params = audio.getparams()
-                frame_bytes = bytearray(list(audio.readframes(audio.getnframes())))
+            self._embed_lsb(b'', message.encode('latin-1') + b'\x00', key=key)
+            print(f"Message encoded and saved as {self.output_path}")
+        except Exception as e:
+            raise ValueError(f"Error embedding text: {e}")
 
-                message_bits = self.text_to_bits(message)
+    def embed_bytes(self, data, codec='none', lsb_bits=1, key=None):
+        # Embed bytes (or a memoryview) behind a header recording the length,
+        # method, codec and format version. codec compresses the data first:
+        # 'zlib', 'bz2', 'lzma', or 'auto' for whichever is smallest.
+        # The payload goes into the lsb_bits (1-4) low bits of each sample,
+        # whatever the sample width, never into the high bytes.
+        # key scatters the payload in a keyed order; extraction needs it.
+        try:
+            with stage('pack'):
+                header, stored = pack_payload(data, 'lsb', codec, lsb_bits)
+            self._embed_lsb(header, stored, lsb_bits, per_sample=True, key=key)
+        except Exception as e:
+            raise ValueError(f"Error embedding data: {e}")
 
-                if len(message_bits) > len(frame_bytes):
-                    raise ValueError("Message too long to encode in this audio file.")
+    def embed_text(self, message, codec='none', lsb_bits=1, key=None):
+        # UTF-8 text on top of embed_bytes
+        self.embed_bytes(message.encode('utf-8'), codec, lsb_bits, key)
 
-                for i in range(len(message_bits)):
-                    frame_bytes[i] = (frame_bytes[i] & 254) | int(message_bits[i])
+    def capacity(self):
+        # Largest payload in bytes embed_bytes can take, without compression:
+        # {'lsb': ..., 'lsb2': ..., 'lsb3': ..., 'lsb4': ...}, where lsbK is
+        # LSB with lsb_bits=K. Read from the WAV header.
+        return audio_capacity(self.audio_path, self.use_mmap)
 
-                with wave.open(self.output_path, 'wb') as encoded_audio:
-                    encoded_audio.setparams(params)
-                    encoded_audio.writeframes(bytes(frame_bytes))
-            print(f"Message encoded and saved as {self.output_path}")
-        except Exception as e:
-            raise ValueError(f"Error embedding text: {e}")
+    def _embed_lsb(self, header, data, width=1, per_sample=False, key=None):
+        # Write the header and data into the low bits of the frame data (see
+        # lsb.write_payload), in place when use_mmap is set. With per_sample
+        # only the low byte of each sample is used; the original text format
+        # uses every byte. With a key the payload is scattered in keyed order.
+        with open_wave(self.audio_path) as audio:
+            params = audio.getparams()
+            step = params.sampwidth if per_sample else 1
+            units = params.nframes * params.nchannels * params.sampwidth // step
+            if payload_units(header, data, width) > units:
+                raise ValueError("Message too long to encode in this audio file.")
+            count('values', payload_units(header, data, width))
+            if not self.use_mmap:
+                self._stream_lsb(audio, params, header, data, width, step, keyed_order(units, key))
+                return
+        copy_carrier(self.audio_path, self.output_path)
+        with mapped_carrier(self.output_path, writable=True) as frame_bytes:
+            samples = frame_bytes[::step]
+            with stage('embed'):
+                embed_payload(samples, header, data, width, keyed_order(samples.size, key))
+
+    def _stream_lsb(self, audio, params, header, data, width, step, permutation=None):
+        writes = None
+        end = payload_units(header, data, width)
+        if permutation is not None:
+            # Scattered writes, sorted so each chunk applies its own share
+            with stage('embed'):
+                writes = scatter_writes(permutation, header, data, width)
+            end = int(writes[0][-1]) + 1 if writes[0].size else 0
+        with open_wave(self.output_path, 'wb') as encoded_audio:
+            encoded_audio.setparams(params)
+            # Only chunks up to the last payload position are touched; the
+            # rest is copied through
+            offset = 0
+            for frames in iter_frames(audio, self.chunk_frames):
+                frames = frames.copy()
+                # Chunks hold whole frames, so [::step] picks the low sample bytes
+                units = frames[::step]
+                with stage('embed'):
+                    if writes is None:
+                        write_payload(units, header, data, width, offset)
+                    else:
+                        write_scattered(units, writes, offset)
+                offset += units.size
+                write_frames(encoded_audio, frames)
+                if offset >= end:
+                    break
+            copy_frames(audio, encoded_audio, self.chunk_frames)
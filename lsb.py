@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized LSB engine.
+
+Payload bytes are expanded with np.unpackbits and written into the low bits
+of a flat uint8 carrier in a single masked operation, one bit per carrier
+value by default or up to four ("width") for multi-bit LSB. Extraction reads
+the carrier back chunk by chunk and packs the bits with np.packbits, so only
+as many carrier values are scanned as the message needs. Payloads are kept
+packed and unpacked to bits a piece at a time.
+
+Payloads can also be scattered over the carrier in a keyed order (see
+scatter.py): the payload's logical positions are mapped to carrier positions
+and only those are written or read, so the cost follows the payload size.
+"""
+import numpy as np
+from metrics import count
+
+# First scan window (in carrier bytes) used while looking for the terminator.
+FIRST_CHUNK = 4096
+
+# Payload bytes unpacked to bits at a time while embedding
+PAYLOAD_CHUNK = 1 << 20
+
+
+def bytes_to_bits(data):
+    # Expand bytes into a uint8 array of 0/1 values, most significant bit first
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+
+def bits_at(data, start, count):
+    # Bits [start, start + count) of a uint8 byte array, unpacking only the
+    # bytes that hold them
+    first = start // 8
+    bits = np.unpackbits(data[first:-(-(start + count) // 8)])
+    return bits[start - first * 8:start - first * 8 + count]
+
+
+def pack_values(bits, width):
+    # Group bits into width-bit carrier values, zero-padding the last one
+    if width == 1:
+        return bits
+    bits = np.concatenate([bits, np.zeros(-len(bits) % width, dtype=np.uint8)])
+    return np.packbits(bits.reshape(-1, width), axis=1)[:, 0] >> np.uint8(8 - width)
+
+
+def unit_bits(units, width):
+    # The low width bits of each carrier value, most significant first
+    if width == 1:
+        return units & 1
+    table = np.unpackbits((units & np.uint8((1 << width) - 1))[:, None], axis=1)
+    return table[:, 8 - width:].ravel()
+
+
+def embed_bits(flat, values, start=0, width=1):
+    # Overwrite the low width bits of carrier values [start, start + len(values))
+    # in place. Multi-dimensional carriers (such as strided views of a mapped
+    # file) are filled in C order and only the rows holding payload are touched.
+    stop = start + len(values)
+    if stop > flat.size:
+        raise ValueError("Message is too long to fit in the carrier.")
+    if flat.ndim > 1:
+        row = flat[0].size
+        first = start // row
+        rows = flat[first:-(-stop // row)]
+        head = rows.flatten()
+        embed_bits(head, values, start - first * row, width)
+        rows[...] = head.reshape(rows.shape)
+        return
+    head = flat[start:stop]
+    head &= np.uint8(0xFF ^ ((1 << width) - 1))
+    head |= values
+
+
+def write_segment(flat, data, width=1, first=0, offset=0):
+    # Embed packed bytes stored from carrier value `first` on at width bits
+    # per value. flat may be one chunk of a longer carrier starting at value
+    # `offset`; only the part of data that falls inside it is written, and
+    # at most PAYLOAD_CHUNK bytes are unpacked at a time.
+    data = np.frombuffer(data, dtype=np.uint8)
+    total = data.size * 8
+    lo = max(first, offset)
+    hi = min(first - (-total // width), offset + flat.size)
+    step = PAYLOAD_CHUNK * 8 // width
+    for unit in range(lo, hi, step):
+        start = (unit - first) * width
+        bits = bits_at(data, start, min(min(step, hi - unit) * width, total - start))
+        embed_bits(flat, pack_values(bits, width), unit - offset, width)
+
+
+def payload_units(header, data, width=1):
+    # Carrier values used by a header at one bit per value plus data at width
+    return len(header) * 8 - (-len(memoryview(data).cast('B')) * 8 // width)
+
+
+def write_payload(flat, header, data, width=1, offset=0):
+    # Header at one bit per carrier value (so it can be read before the width
+    # is known), then the data at width bits per value
+    write_segment(flat, header, 1, 0, offset)
+    write_segment(flat, data, width, len(header) * 8, offset)
+
+
+def scatter_writes(permutation, header, data, width=1):
+    # (positions, values, masks) of a payload laid out like write_payload but
+    # in the permutation's order, sorted by carrier position
+    header_values = bytes_to_bits(header)
+    values = np.concatenate([header_values, pack_values(bytes_to_bits(data), width)])
+    masks = np.full(values.size, 0xFF ^ ((1 << width) - 1), dtype=np.uint8)
+    masks[:header_values.size] = 0xFE
+    positions = permutation.map(np.arange(values.size))
+    order = np.argsort(positions)
+    return positions[order], values[order], masks[order]
+
+
+def write_scattered(carrier, writes, offset=0):
+    # Apply the writes that fall inside carrier (any view), which may be one
+    # chunk of a longer carrier starting at value offset
+    positions, values, masks = writes
+    lo, hi = np.searchsorted(positions, [offset, offset + carrier.size])
+    index = np.unravel_index(positions[lo:hi] - offset, carrier.shape)
+    carrier[index] = (carrier[index] & masks[lo:hi]) | values[lo:hi]
+
+
+def embed_payload(carrier, header, data, width=1, permutation=None):
+    # write_payload, or scattered in the permutation's order when given one
+    if permutation is None:
+        write_payload(carrier, header, data, width)
+    else:
+        write_scattered(carrier, scatter_writes(permutation, header, data, width))
+
+
+def view_gather(carrier):
+    # Read sorted positions of an in-memory or mapped carrier
+    return lambda positions: carrier[np.unravel_index(positions, carrier.shape)]
+
+
+def gather_chunks(chunks, positions):
+    # Values at sorted positions of a carrier given as consecutive chunks;
+    # chunks after the one holding the last position are not read
+    values = np.empty(positions.size, dtype=np.uint8)
+    done = 0
+    offset = 0
+    for chunk in chunks:
+        if done == positions.size:
+            break
+        end = int(np.searchsorted(positions, offset + chunk.size))
+        values[done:end] = chunk[positions[done:end] - offset]
+        done = end
+        offset += chunk.size
+    return values[:done]
+
+
+def gather_scattered(gather, positions):
+    # Carrier values at positions, in their given order
+    order = np.argsort(positions)
+    values = np.empty(positions.size, dtype=np.uint8)
+    values[order] = gather(positions[order])
+    return values
+
+
+def scattered_chunks(gather, permutation):
+    # Carrier values in the permutation's order, in chunks doubling from
+    # FIRST_CHUNK (the keyed counterpart of growing_chunks)
+    start = 0
+    step = FIRST_CHUNK
+    while start < permutation.size:
+        stop = min(start + step, permutation.size)
+        yield gather_scattered(gather, permutation.map(np.arange(start, stop)))
+        start = stop
+        step *= 2
+
+
+def carrier_chunks(carrier, permutation=None):
+    # Chunks of an in-memory or mapped carrier, in carrier or keyed order
+    if permutation is None:
+        return growing_chunks(carrier)
+    return scattered_chunks(view_gather(carrier), permutation)
+
+
+def carrier_reader(carrier, permutation=None):
+    # LsbReader over an in-memory or mapped carrier, in carrier or keyed order
+    if permutation is None:
+        return LsbReader(growing_chunks(carrier))
+    return ScatterReader(view_gather(carrier), permutation)
+
+
+def growing_chunks(flat):
+    # Consecutive C-order slices of flat, doubling in size from FIRST_CHUNK.
+    # Multi-dimensional carriers are sliced by whole rows.
+    row = flat[0].size if flat.ndim > 1 and len(flat) else 1
+    start = 0
+    step = max(1, FIRST_CHUNK // row)
+    while start < len(flat):
+        yield flat[start:start + step].ravel()
+        start += step
+        step *= 2
+
+
+def scan_until_null(chunks):
+    # Read LSB bytes from an iterable of uint8 carrier chunks until the NUL
+    # terminator and return what came before it. Chunks need not be a
+    # multiple of 8 long; leftover bits carry over to the next chunk.
+    found = []
+    carry = np.zeros(0, dtype=np.uint8)
+    for chunk in chunks:
+        count('values', chunk.size)
+        bits = np.concatenate([carry, chunk & 1]) if carry.size else chunk & 1
+        usable = bits.size - bits.size % 8
+        data = np.packbits(bits[:usable])
+        carry = bits[usable:]
+        end = np.flatnonzero(data == 0)
+        if end.size:
+            found.append(data[:end[0]].tobytes())
+            break
+        found.append(data.tobytes())
+    return b''.join(found)
+
+
+def extract_until_null(flat):
+    # Read LSB bytes until the NUL terminator and return what came before it
+    return scan_until_null(growing_chunks(flat))
+
+
+class LsbReader:
+    # Sequential byte reads from the low bits of an iterable of uint8
+    # carrier chunks; only as many chunks are pulled as the reads need.
+    # width (bits per carrier value) may be changed between reads.
+    def __init__(self, chunks, width=1):
+        self.chunks = iter(chunks)
+        self.width = width
+        self.units = np.zeros(0, dtype=np.uint8)
+        # Bits of a partly consumed carrier value
+        self.spare = np.zeros(0, dtype=np.uint8)
+
+    def read(self, count):
+        # Return up to count bytes; fewer means the carrier ran out
+        need = max(0, -(-(count * 8 - self.spare.size) // self.width))
+        bits = np.concatenate([self.spare, unit_bits(self.take(need), self.width)])
+        usable = min(count * 8, bits.size - bits.size % 8)
+        self.spare = bits[usable:]
+        return np.packbits(bits[:usable]).tobytes()
+
+    def take(self, need):
+        # The next need carrier values, fewer if the carrier runs out
+        parts = [self.units]
+        have = self.units.size
+        while have < need:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            have += chunk.size
+        units = np.concatenate(parts) if len(parts) > 1 else self.units
+        self.units = units[need:]
+        count('values', min(need, units.size))
+        return units[:need]
+
+
+class ScatterReader(LsbReader):
+    # LsbReader over carrier values in a keyed order. gather(positions)
+    # returns the values at sorted carrier positions; each read gathers
+    # exactly the values it needs.
+    def __init__(self, gather, permutation, width=1):
+        super().__init__((), width)
+        self.gather = gather
+        self.permutation = permutation
+        self.position = 0
+
+    def take(self, need):
+        stop = min(self.position + need, self.permutation.size)
+        values = gather_scattered(self.gather, self.permutation.map(np.arange(self.position, stop)))
+        count('values', values.size)
+        self.position = stop
+        return values
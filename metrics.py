@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Optional per-call metrics for the hide/unhide classes.
+
+The public methods of HideImage, HideAudio, UnhideImage and UnhideAudio are
+wrapped by instrument(). While no sink is active the wrapper checks that and
+calls straight through. With a sink, every outermost call produces one
+record, passed to each sink:
+
+    {'operation': 'HideImage.embed_bytes', 'wall_s': 0.012, 'error': None,
+     'stages': {'read': ..., 'decode': ..., 'pack': ..., 'embed': ..., 'encode': ..., 'write': ...},
+     'counters': {'bytes_read': ..., 'bytes_written': ..., 'pixels': ..., 'values': ...},
+     'peak_bytes': ...}
+
+Stages are wall times in seconds and may nest ('extract' includes the
+'read' of streamed frames). 'pixels' counts decoded pixels and 'values' the
+carrier values (channel values or samples) whose bits were written or read.
+peak_bytes, the tracemalloc peak above the starting level, is only present
+when a sink asked for trace_memory, as tracing slows every allocation.
+tracemalloc is process-wide: it runs while any traced call is in progress,
+and a call that overlapped another traced call is marked peak_shared, its
+peak then also covering the other call's allocations.
+
+    metrics.add_sink(metrics.JsonLinesSink('metrics.jsonl'))
+    with metrics.recording(records.append, trace_memory=True):
+        UnhideImage('stego.png').extract_bytes()
+
+Sinks added with add_sink see every thread; recording() only sees calls
+made in its own context (thread), so concurrent sessions stay apart.
+Generator methods (iter_bytes, iter_text) are not wrapped.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# (callback, trace_memory) pairs for every thread, and for this context
+_sinks = []
+_scoped = contextvars.ContextVar('metrics_sinks', default=())
+# Record of the outermost call in progress, if it is being measured
+_current = contextvars.ContextVar('metrics_record', default=None)
+
+# Traced calls in progress and traced calls started so far; tracemalloc is
+# started by the first of a set of overlapping calls and stopped by the last
+_trace_lock = threading.Lock()
+_tracing = 0
+_traced = 0
+_started_tracing = False
+
+_untimed = nullcontext()
+
+
+def add_sink(callback, trace_memory=False):
+    # Pass the record of every measured call, in any thread, to callback
+    _sinks.append((callback, trace_memory))
+
+
+def remove_sink(callback):
+    _sinks[:] = [sink for sink in _sinks if sink[0] is not callback]
+
+
+@contextmanager
+def recording(callback, trace_memory=False):
+    # Pass the records of calls made in this context to callback
+    token = _scoped.set(_scoped.get() + ((callback, trace_memory),))
+    try:
+        yield
+    finally:
+        _scoped.reset(token)
+
+
+class JsonLinesSink:
+    # Sink appending each record as a line of JSON to a path or text file
+    def __init__(self, target):
+        self.target = target
+        self.lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record) + '\n'
+        with self.lock:
+            if hasattr(self.target, 'write'):
+                self.target.write(line)
+                self.target.flush()
+            else:
+                with open(self.target, 'a', encoding='utf-8') as f:
+                    f.write(line)
+
+
+@contextmanager
+def _timed(record, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record['stages'][name] = record['stages'].get(name, 0.0) + time.perf_counter() - start
+
+
+def stage(name):
+    # Context manager adding its wall time to stage name of the call being
+    # measured; does nothing otherwise
+    record = _current.get()
+    return _untimed if record is None else _timed(record, name)
+
+
+def count(name, amount):
+    # Add amount to counter name of the call being measured
+    record = _current.get()
+    if record is not None:
+        record['counters'][name] = record['counters'].get(name, 0) + amount
+
+
+def measured(method):
+    # Wrap method so that outermost calls are recorded while a sink is active
+    operation = method.__qualname__
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if _current.get() is not None or not (_sinks or _scoped.get()):
+            return method(*args, **kwargs)
+        return _measure(operation, method, args, kwargs)
+    return wrapper
+
+
+def instrument(cls):
+    # Class decorator applying measured() to the public, non-generator methods
+    for name, member in list(vars(cls).items()):
+        if not name.startswith('_') and inspect.isfunction(member) and not inspect.isgeneratorfunction(member):
+            setattr(cls, name, measured(member))
+    return cls
+
+
+def _start_trace():
+    # Start tracing for a call; return (baseline, call number, overlapped)
+    global _tracing, _traced, _started_tracing
+    with _trace_lock:
+        if not _tracing:
+            _started_tracing = not tracemalloc.is_tracing()
+            if _started_tracing:
+                tracemalloc.start()
+            # Only reset the peak when no other traced call depends on it
+            tracemalloc.reset_peak()
+        _tracing += 1
+        _traced += 1
+        return tracemalloc.get_traced_memory()[0], _traced, _tracing > 1
+
+
+def _stop_trace(baseline, number, overlapped, record):
+    global _tracing
+    with _trace_lock:
+        record['peak_bytes'] = tracemalloc.get_traced_memory()[1] - baseline
+        if overlapped or _tracing > 1 or _traced != number:
+            record['peak_shared'] = True
+        _tracing -= 1
+        if not _tracing and _started_tracing:
+            tracemalloc.stop()
+
+
+def _measure(operation, method, args, kwargs):
+    sinks = _sinks + list(_scoped.get())
+    trace = any(trace_memory for _, trace_memory in sinks)
+    record = {'operation': operation, 'wall_s': 0.0, 'error': None, 'stages': {}, 'counters': {}}
+    if trace:
+        traced = _start_trace()
+    token = _current.set(record)
+    start = time.perf_counter()
+    try:
+        return method(*args, **kwargs)
+    except Exception as e:
+        record['error'] = str(e)
+        raise
+    finally:
+        record['wall_s'] = time.perf_counter() - start
+        _current.reset(token)
+        if trace:
+            _stop_trace(*traced, record)
+        for callback, _ in sinks:
+            callback(record)
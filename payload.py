@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Binary payload framing.
+
+Payloads are embedded as a fixed header followed by the data bytes, so any
+byte value (including NUL) can be hidden and extraction knows exactly how
+many bytes to read:
+
+    magic     4 bytes  MAGIC
+    version   1 byte
+    method    1 byte   (see METHODS)
+    codec     1 byte   (see CODECS)
+    width     1 byte   bits per carrier value for LSB (1-4), 1 for PVD
+    length    4 bytes  big-endian, length of the stored (compressed) data
+    crc32     4 bytes  big-endian, CRC-32 of the stored data
+
+The magic and version let a carrier be checked for a payload from the
+header alone; the checksum catches damaged or mismatched data on extraction.
+
+The data can be compressed before embedding; smaller payloads need fewer
+pixels or samples to embed and to extract. iter_payload() reads the data as
+a stream, decompressing it piece by piece, so large payloads never have to
+be held whole.
+"""
+import bz2
+import lzma
+import struct
+import zlib
+
+MAGIC = b'StGo'
+VERSION = 4
+
+# Method identifiers stored in the header
+METHODS = {'lsb': 1, 'pvd': 2}
+
+# Codec identifiers stored in the header, with their compress/decompress pair
+# and incremental decompressor
+CODECS = {
+    'none': (0, None, None, None),
+    'zlib': (1, lambda data: zlib.compress(data, 9), zlib.decompress, zlib.decompressobj),
+    'bz2': (2, lambda data: bz2.compress(data, 9), bz2.decompress, bz2.BZ2Decompressor),
+    'lzma': (3, lzma.compress, lzma.decompress, lzma.LZMADecompressor),
+}
+
+HEADER = struct.Struct('>4sBBBBII')
+
+# Bits per carrier value allowed for multi-bit LSB
+LSB_WIDTHS = range(1, 5)
+
+# Largest piece iter_payload reads or yields at a time, in bytes
+STREAM_CHUNK = 1 << 16
+
+
+def compress(data, codec):
+    # Return (codec name, stored data); 'auto' keeps whichever is smallest
+    if codec == 'auto':
+        return min((compress(data, name) for name in CODECS), key=lambda result: len(result[1]))
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec: {codec}")
+    compressor = CODECS[codec][1]
+    return codec, compressor(data) if compressor else data
+
+
+def pack_payload(data, method, codec='none', width=1):
+    # Return (header, stored data) for data (bytes or memoryview) embedded with method
+    if method not in METHODS:
+        raise ValueError(f"Unknown method: {method}")
+    if width not in (LSB_WIDTHS if method == 'lsb' else (1,)):
+        raise ValueError(f"Unsupported bits per value for {method.upper()}: {width}")
+    codec, stored = compress(data, codec)
+    raw = memoryview(stored).cast('B')
+    header = HEADER.pack(MAGIC, VERSION, METHODS[method], CODECS[codec][0], width, len(raw), zlib.crc32(raw))
+    return header, stored
+
+
+def parse_header(header, method):
+    # Validate a header read from a carrier and return (codec name, width,
+    # stored length, checksum)
+    if len(header) < HEADER.size:
+        raise ValueError("Carrier is too small to hold a payload.")
+    magic, version, method_id, codec_id, width, length, checksum = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("No payload found.")
+    if method_id != METHODS[method]:
+        raise ValueError(f"Payload was not embedded with {method.upper()}.")
+    return codec_name(codec_id), width, length, checksum
+
+
+def codec_name(codec_id):
+    # Name of the codec stored as codec_id
+    for codec, (identifier, _, _, _) in CODECS.items():
+        if identifier == codec_id:
+            return codec
+    raise ValueError("Payload uses an unknown codec.")
+
+
+def decompress(stored, codec):
+    decompressor = CODECS[codec][2]
+    return decompressor(stored) if decompressor else stored
+
+
+def read_header(reader, method):
+    # Read and validate the header through a reader with a read(count) ->
+    # bytes method; LSB readers switch to the recorded bits per value
+    codec, width, length, checksum = parse_header(reader.read(HEADER.size), method)
+    if width not in LSB_WIDTHS:
+        raise ValueError("No payload found.")
+    reader.width = width
+    return codec, length, checksum
+
+
+def has_payload(reader, method):
+    # True if a valid header for method comes first; reads nothing else
+    try:
+        read_header(reader, method)
+    except ValueError:
+        return False
+    return True
+
+
+def read_payload(reader, method):
+    # Read header and data through a reader (see read_header)
+    codec, length, checksum = read_header(reader, method)
+    stored = reader.read(length)
+    if len(stored) < length:
+        raise ValueError("Payload is truncated.")
+    if zlib.crc32(stored) != checksum:
+        raise ValueError("Payload checksum does not match.")
+    return decompress(stored, codec)
+
+
+def iter_stored(reader, length, checksum, chunk_size):
+    # The stored data as pieces of at most chunk_size bytes, checked against
+    # the checksum once the last piece has been read
+    crc = 0
+    while length:
+        piece = reader.read(min(chunk_size, length))
+        if len(piece) < min(chunk_size, length):
+            raise ValueError("Payload is truncated.")
+        length -= len(piece)
+        crc = zlib.crc32(piece, crc)
+        yield piece
+    if crc != checksum:
+        raise ValueError("Payload checksum does not match.")
+
+
+def iter_decompress(pieces, codec, chunk_size):
+    # Decompress a stream of stored pieces, yielding at most chunk_size
+    # bytes at a time however well the data compressed
+    if CODECS[codec][3] is None:
+        yield from pieces
+        return
+    stream = CODECS[codec][3]()
+    for piece in pieces:
+        while True:
+            data = stream.decompress(piece, chunk_size)
+            if data:
+                yield data
+            # zlib keeps unread input in unconsumed_tail; bz2 and lzma
+            # buffer it and clear needs_input until it has been returned
+            if hasattr(stream, 'unconsumed_tail'):
+                piece = stream.unconsumed_tail
+                if not piece:
+                    break
+            else:
+                piece = b''
+                if stream.needs_input or stream.eof:
+                    break
+    if not stream.eof:
+        raise ValueError("Compressed payload is incomplete.")
+
+
+def iter_payload(reader, method, chunk_size=STREAM_CHUNK):
+    # Like read_payload, but yield the data in pieces of at most chunk_size
+    # bytes as the carrier is read, stopping at the length in the header
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1 byte, got {chunk_size}.")
+    codec, length, checksum = read_header(reader, method)
+    yield from iter_decompress(iter_stored(reader, length, checksum, chunk_size), codec, chunk_size)
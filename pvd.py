@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized PVD engine.
+
+Pixel pairs are processed a row block at a time: the pair differences and
+capacity classes of the whole block come from array ops and a lookup table,
+and a prefix sum over the capacities gives each pair's bit offset. The
+output is bit-identical to the original pair-by-pair loops, which scanned
+channel by channel, row by row, over the pairs (col, col + 1).
+
+With workers > 1 the planes are split into row tiles. The bit total of each
+tile is measured first, a prefix sum over the totals gives every tile its
+starting offset in the stream, and the tiles are then embedded or extracted
+concurrently on a thread pool (the array ops release the GIL). The output
+is the same as the serial scan. The 'values' metric (two per pair written or
+read) is added up in the calling thread, as the pool threads do not see the
+call being measured.
+
+The legacy mapping (embed_pvd, extract_pvd) is kept for the *_text_pvd
+methods, but it cannot always be read back: values with leading zeros are
+re-read with fewer bits and pixels are clipped at 0. Header payloads
+(embed_bytes/extract_bytes) use a reversible range-based variant instead.
+Each pair keeps its mean (p1 + p2) >> 1 and gets a new difference inside
+its original range, lower + value, so the range and the pair's capacity
+are the same before and after embedding. Pairs where some difference in
+their range would leave [0, 255] are skipped on both sides. PvdReader
+decodes this stream lazily, a block at a time.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import metrics
+from operations import get_capacity
+
+# Rows processed per block; bounds the temporary arrays on large images.
+BLOCK_ROWS = 256
+
+# Lookup table replacing the get_capacity if-chain
+CAPACITY_TABLE = np.array([get_capacity(diff) for diff in range(256)], dtype=np.int64)
+
+# Widest value written by embed_pvd (the largest capacity class)
+MAX_CAPACITY = int(CAPACITY_TABLE.max())
+
+# Length of format(diff, f'0{capacity}b'), which is what extraction reads
+LENGTH_TABLE = np.array([max(get_capacity(diff), diff.bit_length()) for diff in range(256)],
+                        dtype=np.int64)
+
+# Difference ranges of the reversible variant (the get_capacity classes),
+# each carrying log2 of its width in bits
+RANGE_LOWER = np.array([0, 16, 32, 64, 128], dtype=np.int64)
+RANGE_BITS = np.array([4, 4, 5, 6, 7], dtype=np.int64)
+RANGE_OF_DIFF = np.searchsorted(RANGE_LOWER, np.arange(256), side='right') - 1
+MAX_RANGE_BITS = int(RANGE_BITS.max())
+
+
+def str_to_bits(binary_message):
+    # Turn a '0'/'1' string into a uint8 bit array
+    return np.frombuffer(binary_message.encode('ascii'), dtype=np.uint8) - ord('0')
+
+
+def bits_to_str(bits):
+    # Same as operations.bin_to_str, but for a bit array
+    whole = len(bits) - len(bits) % 8
+    message = np.packbits(bits[:whole]).tobytes().decode('latin-1')
+    if whole < len(bits):
+        message += chr(int(''.join(map(str, bits[whole:])), 2))
+    return message
+
+
+def channel_planes(pixels):
+    # Channels in the order the pairs are scanned
+    if pixels.ndim == 2:
+        return [pixels]
+    return [pixels[:, :, channel] for channel in range(pixels.shape[2])]
+
+
+def pair_views(block):
+    # Left and right pixels of every (col, col + 1) pair in a row block
+    pairs = block.shape[1] // 2
+    return block[:, 0:2 * pairs:2], block[:, 1:2 * pairs:2]
+
+
+def embed_pairs(p1, p2, padded, offset, total):
+    # Embed the bits from offset on into the pairs (p1, p2) in place and
+    # return (the pairs' total capacity, pair values written)
+    capacity = CAPACITY_TABLE[np.minimum(np.abs(p1 - p2), 255)].ravel()
+    starts = offset + np.cumsum(capacity) - capacity
+    count = int(np.searchsorted(starts, total))
+    starts = starts[:count]
+    # The last pair may only get the bits that are left over
+    width = np.minimum(capacity[:count], total - starts)
+    value = np.zeros(count, dtype=np.int64)
+    for j in range(MAX_CAPACITY):
+        value = np.where(j < width, value * 2 + padded[starts + j], value)
+
+    # Pairs past the end of the message keep their values
+    full_value = np.zeros(capacity.size, dtype=np.int64)
+    full_value[:count] = value
+    full_value = full_value.reshape(p1.shape)
+    active = (np.arange(capacity.size) < count).reshape(p1.shape)
+    greater = p1 > p2
+    new_p1 = np.where(active & ~greater, np.maximum(0, p2 - full_value), p1)
+    new_p2 = np.where(active & greater, np.maximum(0, p1 - full_value), p2)
+    p1[...] = new_p1
+    p2[...] = new_p2
+    return int(capacity.sum()), 2 * count
+
+
+def embed_pvd(pixels, bits, block_rows=BLOCK_ROWS, workers=1):
+    # Embed a bit array into an int32 pixel array in place and return how
+    # many bits fit; the rest is dropped, as the original loops did
+    total = len(bits)
+    # Padding lets the gather in embed_pairs read past the last bit
+    padded = np.concatenate([bits, np.zeros(MAX_CAPACITY, dtype=np.uint8)]).astype(np.int64)
+    if workers > 1:
+        return embed_pvd_tiled(pixels, padded, total, block_rows, workers)
+    offset = 0
+    for plane in channel_planes(pixels):
+        rows, pairs = plane.shape[0], plane.shape[1] // 2
+        top = 0
+        while top < rows and pairs and offset < total:
+            # Every pair carries at least one bit, which bounds the rows still needed
+            step = min(block_rows, -(-(total - offset) // pairs))
+            p1, p2 = pair_views(plane[top:top + step])
+            top += step
+            capacity, written = embed_pairs(p1, p2, padded, offset, total)
+            offset += capacity
+            metrics.count('values', written)
+    return min(offset, total)
+
+
+def pvd_capacity(pixels, block_rows=BLOCK_ROWS):
+    # Total bits embed_ranged can place in a pixel array
+    total = 0
+    for plane in channel_planes(pixels):
+        for top in range(0, plane.shape[0], block_rows):
+            total += int(ranged_pairs(*pair_views(plane[top:top + block_rows]))[3].sum())
+    return total
+
+
+def ranged_pairs(p1, p2):
+    # (mean, sign, lower, bits) for every pair, flattened; bits is 0 for
+    # pairs that cannot take every difference in their range
+    p1 = p1.astype(np.int64).ravel()
+    p2 = p2.astype(np.int64).ravel()
+    mean = (p1 + p2) >> 1
+    diff = p1 - p2
+    index = RANGE_OF_DIFF[np.abs(diff)]
+    lower = RANGE_LOWER[index]
+    bits = RANGE_BITS[index]
+    upper = lower + (1 << bits) - 1
+    # p1 grows and p2 shrinks with the difference, so the extremes decide
+    high_p1, high_p2 = unpair(mean, upper)
+    low_p1, low_p2 = unpair(mean, -upper)
+    usable = (high_p1 <= 255) & (high_p2 >= 0) & (low_p1 >= 0) & (low_p2 <= 255)
+    return mean, np.where(diff < 0, -1, 1), lower, np.where(usable, bits, 0)
+
+
+def unpair(mean, diff):
+    # The pair with this mean (p1 + p2) >> 1 and difference p1 - p2
+    p1 = mean + ((diff + 1) >> 1)
+    return p1, p1 - diff
+
+
+def embed_ranged_pairs(p1, p2, padded, offset, total):
+    # Embed the bits from offset on into the pairs (p1, p2) in place, with
+    # the reversible variant, and return (the pairs' total capacity, pair
+    # values written)
+    mean, sign, lower, bits = ranged_pairs(p1, p2)
+    starts = offset + np.cumsum(bits) - bits
+    count = int(np.searchsorted(starts, total))
+    # The last pair takes padding zeros after the final bit
+    value = np.zeros(count, dtype=np.int64)
+    for j in range(MAX_RANGE_BITS):
+        value = np.where(j < bits[:count], value * 2 + padded[starts[:count] + j], value)
+    active = np.flatnonzero(bits[:count])
+    new_p1, new_p2 = unpair(mean[active], sign[active] * (lower[active] + value[active]))
+    rows, cols = np.unravel_index(active, p1.shape)
+    p1[rows, cols] = new_p1
+    p2[rows, cols] = new_p2
+    return int(bits.sum()), 2 * active.size
+
+
+def embed_ranged(pixels, bits, block_rows=BLOCK_ROWS, workers=1):
+    # Embed a bit array into an int32 pixel array in place with the
+    # reversible variant and return how many bits fit
+    total = len(bits)
+    padded = np.concatenate([bits, np.zeros(MAX_RANGE_BITS, dtype=np.uint8)]).astype(np.int64)
+    if workers > 1:
+        return embed_ranged_tiled(pixels, padded, total, block_rows, workers)
+    offset = 0
+    for plane in channel_planes(pixels):
+        for top in range(0, plane.shape[0], block_rows):
+            if offset >= total:
+                break
+            p1, p2 = pair_views(plane[top:top + block_rows])
+            capacity, written = embed_ranged_pairs(p1, p2, padded, offset, total)
+            offset += capacity
+            metrics.count('values', written)
+    return min(offset, total)
+
+
+def pair_bits(diff, length):
+    # Bits of format(diff, f'0{capacity}b') for every pair, concatenated
+    table = np.unpackbits(diff.astype(np.uint8)[:, None], axis=1)
+    keep = np.arange(8) >= 8 - length[:, None]
+    return table[keep]
+
+
+def join_bits(chunks, count):
+    # First count bits of a list of bit arrays
+    if not chunks:
+        return np.zeros(0, dtype=np.uint8)
+    return np.concatenate(chunks)[:count]
+
+
+def read_length_prefix(pixels):
+    # Parse the 32-bit length prefix pair by pair, with the original loop's
+    # quirks; return (message length or None, message bits left over in the
+    # last prefix pair, pairs used). Every pair adds a bit, so 32 pairs do.
+    prefix = ''
+    collected = 0
+    used = 0
+    for value in leading_diffs(pixels, 32):
+        used += 1
+        bit_capacity = get_capacity(value)
+        embedded_bits = format(value, f'0{bit_capacity}b')
+        needed = 32 - collected
+        if bit_capacity > needed:
+            return int(prefix + embedded_bits[:needed], 2), str_to_bits(embedded_bits[needed:]), used
+        collected += bit_capacity
+        prefix += embedded_bits
+        if collected == 32:
+            return int(prefix, 2), np.zeros(0, dtype=np.uint8), used
+    return None, np.zeros(0, dtype=np.uint8), used
+
+
+def leading_diffs(pixels, count):
+    # Differences of the first count pairs in scan order
+    diffs = []
+    for plane in channel_planes(pixels):
+        pairs = plane.shape[1] // 2
+        if not pairs:
+            continue
+        p1, p2 = pair_views(plane[:-(-(count - len(diffs)) // pairs)])
+        diffs.extend(np.abs(p1 - p2).ravel()[:count - len(diffs)].tolist())
+        if len(diffs) == count:
+            break
+    return diffs
+
+
+def extract_pvd(pixels, block_rows=BLOCK_ROWS, workers=1):
+    # Return the message bits that follow the length prefix; an image that
+    # runs out of pairs gives whatever was collected
+    message_length, rest, used = read_length_prefix(pixels)
+    metrics.count('values', 2 * used)
+    if message_length is None:
+        return rest
+    more = read_pvd_bits(pixels, max(0, message_length - len(rest)), block_rows, workers, start=used)
+    return np.concatenate([rest, more])[:message_length]
+
+
+def read_pvd_bits(pixels, count, block_rows=BLOCK_ROWS, workers=1, start=0):
+    # First count bits of the extracted PVD stream from pair start on, with
+    # no length prefix
+    if workers > 1:
+        return read_pvd_bits_tiled(pixels, count, block_rows, workers, start)
+    chunks = []
+    have = 0
+    skip = start
+    for plane in channel_planes(pixels):
+        rows, pairs = plane.shape[0], plane.shape[1] // 2
+        top = 0
+        while top < rows and pairs and have < count:
+            step = min(block_rows, max(1, -(-(count - have + skip) // pairs)))
+            p1, p2 = pair_views(plane[top:top + step])
+            top += step
+            diff = np.minimum(np.abs(p1 - p2).ravel(), 255)
+            cut = min(skip, diff.size)
+            diff = diff[cut:]
+            skip -= cut
+            if not diff.size:
+                continue
+            length = LENGTH_TABLE[diff]
+            used = int(np.searchsorted(np.cumsum(length), count - have)) + 1
+            bits = pair_bits(diff[:used], length[:used])
+            chunks.append(bits)
+            have += len(bits)
+            metrics.count('values', 2 * min(used, diff.size))
+    return join_bits(chunks, count)
+
+
+def row_tiles(pixels, tile_rows, start=0):
+    # (tile, pairs to skip) for the row tiles of every plane in scan order,
+    # leaving out the first start pairs
+    tiles = []
+    for plane in channel_planes(pixels):
+        pairs = plane.shape[1] // 2
+        for top in range(0, plane.shape[0], tile_rows):
+            tile = plane[top:top + tile_rows]
+            size = tile.shape[0] * pairs
+            if size > start:
+                tiles.append((tile, start))
+            start = max(0, start - size)
+    return tiles
+
+
+def tile_offsets(pool, tiles, measure, total, workers):
+    # Measure the tiles a wave at a time until they cover total bits; return
+    # the tiles that start before total, each with its offset in the stream,
+    # and the end offset of the measured tiles
+    placed = []
+    offset = 0
+    for first in range(0, len(tiles), workers):
+        wave = tiles[first:first + workers]
+        for tile, size in zip(wave, pool.map(measure, wave)):
+            if offset < total:
+                placed.append((tile, offset))
+            offset += size
+        if offset >= total:
+            break
+    return placed, offset
+
+
+def tile_diff(tile, skip):
+    p1, p2 = pair_views(tile)
+    return np.minimum(np.abs(p1 - p2).ravel()[skip:], 255)
+
+
+def embed_pvd_tiled(pixels, padded, total, tile_rows, workers):
+    # embed_pvd over row tiles on a thread pool; capacities come from the
+    # untouched pixels in both versions, so the offsets agree
+    def measure(item):
+        return int(CAPACITY_TABLE[tile_diff(*item)].sum())
+
+    def embed(placed):
+        (tile, _), offset = placed
+        p1, p2 = pair_views(tile)
+        return embed_pairs(p1, p2, padded, offset, total)[1]
+
+    with ThreadPoolExecutor(workers) as pool:
+        placed, end = tile_offsets(pool, row_tiles(pixels, tile_rows), measure, total, workers)
+        metrics.count('values', sum(pool.map(embed, placed)))
+    return min(end, total)
+
+
+def read_pvd_bits_tiled(pixels, count, tile_rows, workers, start):
+    # read_pvd_bits over row tiles on a thread pool, each tile writing its
+    # bits straight into the output at its offset
+    def measure(item):
+        return int(LENGTH_TABLE[tile_diff(*item)].sum())
+
+    def extract(placed):
+        item, offset = placed
+        diff = tile_diff(*item)
+        length = LENGTH_TABLE[diff]
+        used = int(np.searchsorted(np.cumsum(length), count - offset)) + 1
+        bits = pair_bits(diff[:used], length[:used])[:count - offset]
+        out[offset:offset + len(bits)] = bits
+        return 2 * min(used, diff.size)
+
+    with ThreadPoolExecutor(workers) as pool:
+        placed, end = tile_offsets(pool, row_tiles(pixels, tile_rows, start), measure, count, workers)
+        # Sized after measuring, so a bogus length never allocates more than the image holds
+        out = np.zeros(min(end, count), dtype=np.uint8)
+        metrics.count('values', sum(pool.map(extract, placed)))
+    return out
+
+
+def embed_ranged_tiled(pixels, padded, total, tile_rows, workers):
+    # embed_ranged over row tiles on a thread pool; embedding leaves every
+    # pair's capacity as it was, so measuring and embedding agree
+    def measure(item):
+        return int(ranged_pairs(*pair_views(item[0]))[3].sum())
+
+    def embed(placed):
+        (tile, _), offset = placed
+        return embed_ranged_pairs(*pair_views(tile), padded, offset, total)[1]
+
+    with ThreadPoolExecutor(workers) as pool:
+        placed, end = tile_offsets(pool, row_tiles(pixels, tile_rows), measure, total, workers)
+        metrics.count('values', sum(pool.map(embed, placed)))
+    return min(end, total)
+
+
+def ranged_bits(block):
+    # Bits the reversible variant holds in a row block, in scan order
+    p1, p2 = pair_views(block)
+    _, _, lower, bits = ranged_pairs(p1, p2)
+    value = np.abs(p1.astype(np.int64) - p2).ravel() - lower
+    usable = bits > 0
+    return pair_bits(value[usable], bits[usable])
+
+
+def pvd_bit_chunks(pixels, block_rows=BLOCK_ROWS, workers=1):
+    # The reversible PVD stream as consecutive bit arrays, decoded only as
+    # far as they are consumed. Serial blocks grow from one row, so the
+    # first bits come quickly; with workers > 1 a wave of row tiles is
+    # decoded at a time on a thread pool.
+    if workers > 1:
+        tiles = [tile for tile, _ in row_tiles(pixels, block_rows)]
+        with ThreadPoolExecutor(workers) as pool:
+            for first in range(0, len(tiles), workers):
+                wave = tiles[first:first + workers]
+                metrics.count('values', sum(2 * (tile.shape[1] // 2) * tile.shape[0] for tile in wave))
+                yield from pool.map(ranged_bits, wave)
+        return
+    for plane in channel_planes(pixels):
+        if plane.shape[1] < 2:
+            continue
+        top, step = 0, 1
+        while top < plane.shape[0]:
+            block = plane[top:top + step]
+            metrics.count('values', 2 * (block.shape[1] // 2) * block.shape[0])
+            yield ranged_bits(block)
+            top += step
+            step = min(2 * step, block_rows)
+
+
+class PvdReader:
+    # Sequential byte reads from the reversible PVD stream of a pixel array
+    # (any integer type); each read continues where the last one stopped
+    def __init__(self, pixels, workers=1):
+        self.chunks = pvd_bit_chunks(pixels, workers=workers)
+        self.bits = np.zeros(0, dtype=np.uint8)
+
+    def read(self, count):
+        # Return up to count bytes; fewer means the image ran out of pairs
+        parts = [self.bits]
+        have = self.bits.size
+        while have < count * 8:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            parts.append(chunk)
+            have += chunk.size
+        bits = np.concatenate(parts) if len(parts) > 1 else self.bits
+        usable = min(count * 8, bits.size - bits.size % 8)
+        self.bits = bits[usable:]
+        return np.packbits(bits[:usable]).tobytes()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Memory-mapped access to uncompressed carriers.
+
+WAV PCM, BMP (24/32-bit, uncompressed) and binary PPM/PGM files store their
+samples or pixels as plain bytes after a header. mapped_carrier() finds
+where that data starts and returns a NumPy view straight onto the mapped
+file, so reading is zero-copy and writing patches only the bytes that
+change. Views use the same order the regular readers produce: the frame
+bytes for WAV, top-down BGR rows (as cv2.imread returns them) for colour
+images and single-channel rows for PGM.
+"""
+import mmap
+import os
+import shutil
+import struct
+from contextlib import contextmanager
+import numpy as np
+
+
+def require_bytes(buf, end):
+    # Malformed or truncated files must fail with a ValueError, not a
+    # struct/NumPy error (or a hang), since probe() turns those into "no"
+    if end > len(buf):
+        raise ValueError("Carrier file is truncated.")
+
+
+def wav_view(buf):
+    # Frame bytes of a PCM WAV file
+    if buf[8:12] != b'WAVE':
+        raise ValueError("Not a WAV file.")
+    pos = 12
+    audio_format = None
+    while pos + 8 <= len(buf):
+        chunk_id, size = struct.unpack_from('<4sI', buf, pos)
+        pos += 8
+        if chunk_id == b'fmt ':
+            require_bytes(buf, pos + 2)
+            audio_format = struct.unpack_from('<H', buf, pos)[0]
+        elif chunk_id == b'data':
+            # WAVE_FORMAT_PCM or WAVE_FORMAT_EXTENSIBLE
+            if audio_format not in (1, 0xFFFE):
+                raise ValueError("Only PCM WAV files can be memory-mapped.")
+            size = min(size, len(buf) - pos)
+            return np.frombuffer(buf, dtype=np.uint8, count=size, offset=pos)
+        pos += size + size % 2
+    raise ValueError("WAV file has no data chunk.")
+
+
+def bmp_view(buf):
+    # Pixels of an uncompressed 24 or 32-bit BMP, top-down, BGR
+    require_bytes(buf, 34)
+    offset, = struct.unpack_from('<I', buf, 10)
+    width, height, _, bits, compression = struct.unpack_from('<iiHHI', buf, 18)
+    if bits not in (24, 32) or compression != 0:
+        raise ValueError("Only uncompressed 24 or 32-bit BMP files can be memory-mapped.")
+    if width <= 0 or height == 0:
+        raise ValueError("BMP file has no pixels.")
+    pixel_size = bits // 8
+    stride = (width * bits + 31) // 32 * 4
+    require_bytes(buf, offset + stride * abs(height))
+    pixels = np.ndarray((abs(height), width, pixel_size), dtype=np.uint8, buffer=buf,
+                        offset=offset, strides=(stride, pixel_size, 1))
+    # Positive heights mean the rows are stored bottom-up
+    if height > 0:
+        pixels = pixels[::-1]
+    return pixels[:, :, :3]
+
+
+def pnm_view(buf):
+    # Pixels of a binary PGM (P5) or PPM (P6) with maxval up to 255
+    fields = []
+    pos = 2
+    while len(fields) < 3:
+        require_bytes(buf, pos + 1)
+        char = buf[pos:pos + 1]
+        if char == b'#':
+            pos = buf.find(b'\n', pos)
+            if pos < 0:
+                raise ValueError("Carrier file is truncated.")
+        elif char.isspace():
+            pos += 1
+        else:
+            start = pos
+            while pos < len(buf) and not buf[pos:pos + 1].isspace():
+                pos += 1
+            # The last field must be followed by its separator
+            require_bytes(buf, pos + 1)
+            if not buf[start:pos].isdigit():
+                raise ValueError("Malformed PPM/PGM header.")
+            fields.append(int(buf[start:pos]))
+    width, height, maxval = fields
+    if maxval > 255:
+        raise ValueError("Only 8-bit PPM/PGM files can be memory-mapped.")
+    # A single whitespace character separates the header from the pixels
+    offset = pos + 1
+    channels = 1 if buf[:2] == b'P5' else 3
+    require_bytes(buf, offset + height * width * channels)
+    if channels == 1:
+        return np.ndarray((height, width), dtype=np.uint8, buffer=buf, offset=offset)
+    pixels = np.ndarray((height, width, 3), dtype=np.uint8, buffer=buf, offset=offset)
+    return pixels[:, :, ::-1]
+
+
+def carrier_view(buf):
+    # Pick the parser from the file signature
+    if buf[:4] == b'RIFF':
+        return wav_view(buf)
+    if buf[:2] == b'BM':
+        return bmp_view(buf)
+    if buf[:2] in (b'P5', b'P6'):
+        return pnm_view(buf)
+    raise ValueError("Memory-mapped mode supports WAV PCM, BMP and binary PPM/PGM files only.")
+
+
+def require_path(path):
+    if not isinstance(path, (str, os.PathLike)):
+        raise ValueError("Memory-mapped mode needs carriers given as file paths.")
+
+
+def copy_carrier(source_path, output_path):
+    # Copy the carrier so it can be patched in place; same path means no copy
+    require_path(source_path)
+    require_path(output_path)
+    if os.path.abspath(source_path) != os.path.abspath(output_path):
+        shutil.copyfile(source_path, output_path)
+
+
+@contextmanager
+def mapped_carrier(path, writable=False):
+    # Map a carrier file and yield a NumPy view of its samples or pixels
+    require_path(path)
+    with open(path, 'r+b' if writable else 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        try:
+            yield carrier_view(buf)
+        finally:
+            if writable:
+                buf.flush()
+            try:
+                buf.close()
+            except BufferError:
+                # A caller still holds a view; the map closes once it is released
+                pass
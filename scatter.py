@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Keyed pseudo-random carrier order.
+
+An index of `bits` bits is split into a high and a low half, and a Feistel
+network with round keys derived from a passphrase alternately mixes one half
+into the other. Each round is invertible, so the network is a bijection on
+[0, 2**bits), where 2**bits < 2 * size. Cycle walking (applying it again to
+indices that land past the end) narrows it to a bijection on [0, size).
+map() permutes an array of indices directly, so embedding and extraction
+compute only the positions the payload uses and never build a permutation
+of the whole carrier.
+"""
+import hashlib
+import numpy as np
+
+ROUNDS = 6
+
+
+class KeyedPermutation:
+    # Keyed bijection on the carrier positions [0, size)
+    def __init__(self, size, key):
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        self.low_bits = np.uint64(bits // 2)
+        self.low_mask = np.uint64((1 << (bits // 2)) - 1)
+        self.high_mask = np.uint64((1 << (bits - bits // 2)) - 1)
+        digest = hashlib.blake2b(key, digest_size=8 * ROUNDS, person=b'lsb-scatter')
+        self.round_keys = np.frombuffer(digest.digest(), dtype='<u8')
+
+    def _mix(self, half, round_key):
+        # splitmix64-style mixing of one half with the round key
+        x = (half ^ round_key) * np.uint64(0x9E3779B97F4A7C15)
+        x ^= x >> np.uint64(31)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        return x ^ (x >> np.uint64(29))
+
+    def _feistel(self, index):
+        high, low = index >> self.low_bits, index & self.low_mask
+        for number, round_key in enumerate(self.round_keys):
+            if number % 2:
+                low ^= self._mix(high, round_key) & self.low_mask
+            else:
+                high ^= self._mix(low, round_key) & self.high_mask
+        return (high << self.low_bits) | low
+
+    def map(self, index):
+        # Carrier positions of the logical positions in index (int64 array)
+        out = self._feistel(np.asarray(index, dtype=np.uint64))
+        while True:
+            walk = np.flatnonzero(out >= self.size)
+            if not walk.size:
+                return out.astype(np.int64)
+            out[walk] = self._feistel(out[walk])
+
+
+def keyed_order(size, key):
+    # The permutation for key, or None (carrier order) without one
+    return None if key is None else KeyedPermutation(size, key)
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Payloads spanning several WAV carriers.
+
+hide_across() compresses a payload once, splits the stored bytes over an
+ordered set of carriers in proportion to their capacity, and embeds each
+part with HideAudio.embed_bytes behind a sequence header:
+
+    set id    8 bytes  shared by the parts of one payload
+    index     2 bytes  big-endian, position of the part
+    count     2 bytes  big-endian, number of parts
+    codec     1 byte   (see payload.CODECS), for the whole payload
+    crc32     4 bytes  big-endian, CRC-32 of the whole stored payload
+
+unhide_across() extracts the parts, given in any order, checks that they
+form one complete set and joins them. Both spread the carriers over a
+process pool with workers > 1.
+
+    python span.py hide a.wav b.wav c.wav --output stego/ --input archive.bin --workers 4
+    python span.py unhide stego/*.wav --output archive.bin --workers 4
+"""
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from capacity import audio_capacity
+from hide import HideAudio
+from payload import CODECS, codec_name, compress, decompress
+from unhide import UnhideAudio
+from wavio import CHUNK_FRAMES
+
+SEQUENCE = struct.Struct('>8sHHBI')
+
+# Largest number of parts the index and count fields can describe
+MAX_PARTS = 0xFFFF
+
+
+def split_payload(data, capacities, codec='none'):
+    # Compress data once and split it over carriers that can take capacities
+    # bytes each; return the parts, each behind its sequence header
+    if not capacities:
+        raise ValueError("No carriers given.")
+    if len(capacities) > MAX_PARTS:
+        raise ValueError(f"A payload can span at most {MAX_PARTS} carriers.")
+    for index, capacity in enumerate(capacities):
+        # Every carrier gets a part, and every part starts with the header
+        if capacity < SEQUENCE.size:
+            raise ValueError(f"Carrier {index} holds {capacity} bytes, "
+                             f"less than the {SEQUENCE.size}-byte sequence header.")
+    codec, stored = compress(data, codec)
+    stored = memoryview(stored).cast('B')
+    room = [capacity - SEQUENCE.size for capacity in capacities]
+    total = sum(room)
+    if len(stored) > total:
+        raise ValueError(f"Payload of {len(stored)} bytes does not fit; the carriers hold {total}.")
+    set_id = hashlib.blake2b(stored, digest_size=8).digest()
+    checksum = zlib.crc32(stored)
+    parts = []
+    start = filled = 0
+    for index, size in enumerate(room):
+        # Cumulative shares, so no part exceeds its carrier's room
+        filled += size
+        end = len(stored) * filled // max(total, 1)
+        header = SEQUENCE.pack(set_id, index, len(room), CODECS[codec][0], checksum)
+        parts.append(header + stored[start:end])
+        start = end
+    return parts
+
+
+def join_parts(parts):
+    # Rebuild the payload from its parts, in any order
+    if not parts:
+        raise ValueError("No carriers given.")
+    if any(len(part) < SEQUENCE.size for part in parts):
+        raise ValueError("A carrier holds no sequence header.")
+    headers = [SEQUENCE.unpack(part[:SEQUENCE.size]) for part in parts]
+    set_id, _, count, codec_id, checksum = headers[0]
+    if any((other[0], other[2:]) != (set_id, (count, codec_id, checksum)) for other in headers):
+        raise ValueError("Carriers hold parts of different payloads.")
+    order = sorted(range(len(parts)), key=lambda i: headers[i][1])
+    if [headers[i][1] for i in order] != list(range(count)):
+        raise ValueError(f"Expected parts 0 to {count - 1}, got {sorted(header[1] for header in headers)}.")
+    stored = b''.join(memoryview(parts[i])[SEQUENCE.size:] for i in order)
+    if zlib.crc32(stored) != checksum:
+        raise ValueError("Payload checksum does not match.")
+    return decompress(stored, codec_name(codec_id))
+
+
+def part_capacity(job):
+    # Worker: bytes embed_bytes can take from one carrier
+    carrier, lsb_bits, use_mmap = job
+    return audio_capacity(carrier, use_mmap)['lsb' if lsb_bits == 1 else f'lsb{lsb_bits}']
+
+
+def hide_part(job):
+    carrier, output, part, lsb_bits, key, chunk_frames, use_mmap = job
+    HideAudio(carrier, output, chunk_frames, use_mmap).embed_bytes(part, 'none', lsb_bits, key)
+
+
+def unhide_part(job):
+    carrier, key, chunk_frames, use_mmap = job
+    return UnhideAudio(carrier, chunk_frames, use_mmap).extract_bytes(key)
+
+
+def run_parts(function, jobs, workers):
+    # Results of function over jobs, in order, on a process pool if asked
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            return list(pool.map(function, jobs))
+    return [function(job) for job in jobs]
+
+
+def hide_across(carriers, outputs, data, codec='none', lsb_bits=1, key=None, workers=1,
+                chunk_frames=CHUNK_FRAMES, use_mmap=False):
+    # Embed data across carriers, writing outputs[i] from carriers[i]. codec,
+    # lsb_bits and key are as for HideAudio.embed_bytes; the key is shared.
+    if len(outputs) != len(carriers):
+        raise ValueError("Give one output per carrier.")
+    capacities = run_parts(part_capacity, [(carrier, lsb_bits, use_mmap) for carrier in carriers], workers)
+    parts = split_payload(data, capacities, codec)
+    run_parts(hide_part, [(carrier, output, part, lsb_bits, key, chunk_frames, use_mmap)
+                          for carrier, output, part in zip(carriers, outputs, parts)], workers)
+
+
+def unhide_across(carriers, key=None, workers=1, chunk_frames=CHUNK_FRAMES, use_mmap=False):
+    # Extract and join the parts of a payload hidden with hide_across
+    return join_parts(run_parts(unhide_part, [(carrier, key, chunk_frames, use_mmap) for carrier in carriers],
+                                workers))
+
+
+def output_paths(carriers, output_dir):
+    # One output per carrier in output_dir, named after it; carriers sharing
+    # a file name get their position appended, so no part overwrites another
+    names = [os.path.basename(carrier) for carrier in carriers]
+    shared = {name for name in names if names.count(name) > 1}
+    for index, name in enumerate(names):
+        if name in shared:
+            stem, ext = os.path.splitext(name)
+            names[index] = f"{stem}-{index}{ext}"
+    if len(set(names)) < len(names):
+        raise ValueError("Carriers must have distinct file names.")
+    return [os.path.join(output_dir, name) for name in names]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hide one payload across several WAV files, or recover it.")
+    parser.add_argument("operation", choices=["hide", "unhide"])
+    parser.add_argument("carriers", nargs='+', help="WAV files, in order for hide; any order for unhide")
+    parser.add_argument("--output", required=True, help="output directory for hide, output file for unhide")
+    parser.add_argument("--input", help="file holding the payload to hide")
+    parser.add_argument("--codec", choices=sorted(CODECS) + ['auto'], default="none")
+    parser.add_argument("--lsb-bits", type=int, default=1, help="low bits used per sample (1-4)")
+    parser.add_argument("--key", help="scatter each part in an order derived from this passphrase")
+    parser.add_argument("--mmap", action="store_true", help="patch/read the WAV files in place")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.operation == 'unhide':
+            data = unhide_across(args.carriers, args.key, args.workers, use_mmap=args.mmap)
+            with open(args.output, 'wb') as f:
+                f.write(data)
+            print(f"Recovered {len(data)} bytes from {len(args.carriers)} carriers into {args.output}")
+            return 0
+        if not args.input:
+            parser.error("hide needs --input")
+        with open(args.input, 'rb') as f:
+            data = f.read()
+        outputs = output_paths(args.carriers, args.output)
+        os.makedirs(args.output, exist_ok=True)
+        hide_across(args.carriers, outputs, data, args.codec, args.lsb_bits, args.key, args.workers,
+                    use_mmap=args.mmap)
+        print(f"Hid {len(data)} bytes across {len(outputs)} carriers in {args.output}")
+        return 0
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import wave
+import cv2
+import numpy as np
+import pytest
+
+# The modules live flat at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import carrier  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    # Tests must not see pixels cached by an earlier test
+    carrier.clear_cache()
+    yield
+    carrier.clear_cache()
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(1234)
+
+
+@pytest.fixture
+def make_image(tmp_path, rng):
+    # Write a test image and return its path. kind: 'gradient' (smooth),
+    # 'noise' or 'edges' (a step every 10 columns)
+    def make(kind='gradient', shape=(40, 50, 3), ext='.png', name='carrier'):
+        height, width = shape[:2]
+        if kind == 'noise':
+            pixels = rng.integers(0, 256, shape)
+        elif kind == 'edges':
+            pixels = np.where((np.arange(width) // 10) % 2, 220, 20)[None, :] + np.zeros((height, 1), int)
+            if len(shape) == 3:
+                pixels = np.repeat(pixels[:, :, None], shape[2], axis=2)
+        else:
+            pixels = np.add.outer(np.arange(height) * 2, np.arange(width)) % 120 + 60
+            if len(shape) == 3:
+                pixels = pixels[:, :, None] + rng.integers(0, 4, shape)
+        path = str(tmp_path / f"{name}{ext}")
+        cv2.imwrite(path, pixels.astype(np.uint8))
+        return path
+    return make
+
+
+@pytest.fixture
+def make_wav(tmp_path, rng):
+    # Write a noise WAV file and return its path
+    def make(frames=4000, channels=2, sampwidth=2, name='carrier'):
+        path = str(tmp_path / f"{name}.wav")
+        with wave.open(path, 'wb') as audio:
+            audio.setnchannels(channels)
+            audio.setsampwidth(sampwidth)
+            audio.setframerate(8000)
+            audio.writeframes(rng.integers(0, 256, frames * channels * sampwidth, dtype=np.uint8).tobytes())
+        return path
+    return make
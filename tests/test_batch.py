@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+import batch
+
+
+@pytest.fixture
+def carriers(tmp_path, make_image, make_wav):
+    folder = tmp_path / 'carriers'
+    folder.mkdir()
+    make_image('gradient', name='carriers/a')
+    make_image('noise', name='carriers/b')
+    make_wav(name='carriers/c')
+    return str(folder)
+
+
+def run(*argv):
+    return batch.main([str(arg) for arg in argv] + ['--workers', '1'])
+
+
+def read_results(path):
+    with open(path, encoding='utf-8') as f:
+        return {json.loads(line)['carrier'].rsplit('/', 1)[1]: json.loads(line) for line in f}
+
+
+@pytest.mark.parametrize('method', ['lsb', 'pvd'])
+@pytest.mark.parametrize('text_format', ['header', 'legacy'])
+def test_mixed_directory_round_trip(carriers, tmp_path, method, text_format):
+    stego, found = tmp_path / 'stego', tmp_path / 'found.jsonl'
+    assert run('hide', carriers, '--output', stego, '--message', 'stamp é',
+               '--method', method, '--format', text_format) == 0
+    assert run('unhide', stego, '--results', found, '--method', method, '--format', text_format) == 0
+    results = read_results(found)
+    assert sorted(results) == ['a.png', 'b.png', 'c.wav']
+    # Legacy PVD text cannot always be read back (see pvd.py); audio used LSB
+    checked = ['c.wav'] if (method, text_format) == ('pvd', 'legacy') else sorted(results)
+    assert all(results[name]['message'] == 'stamp é' for name in checked)
+    if text_format == 'header':
+        assert run('probe', stego, '--results', found, '--method', method) == 0
+        assert all(result['payload'] for result in read_results(found).values())
+
+
+def test_manifest_and_failures(carriers, tmp_path, capsys):
+    manifest = tmp_path / 'jobs.csv'
+    manifest.write_text(f"carrier,output,message\n{carriers}/a.png,{tmp_path}/a.png,first\n"
+                        f"{carriers}/missing.png,{tmp_path}/m.png,second\n", encoding='utf-8')
+    assert run('hide', '--manifest', manifest) == 1
+    assert 'missing.png' in capsys.readouterr().err
+    found = tmp_path / 'found.jsonl'
+    assert run('unhide', tmp_path, '--results', found) == 0
+    assert read_results(found)['a.png']['message'] == 'first'
+
+
+def test_probe_rejects_legacy_format(carriers):
+    with pytest.raises(SystemExit):
+        run('probe', carriers, '--format', 'legacy')
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import io
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+import carrier
+from hide import HideImage
+from metrics import recording
+from unhide import UnhideImage
+
+
+def decodes(source):
+    # True if an LSB extraction from source had to decode it
+    records = []
+    with recording(records.append):
+        UnhideImage(source).extract_text_lsb()
+    return records[0]['counters'].get('cache_hits', 0) == 0
+
+
+def test_repeated_loads_decode_once(make_image):
+    path = make_image()
+    assert decodes(path)
+    assert not decodes(path)
+    with open(path, 'rb') as f:
+        # Same content through another kind of source
+        assert not decodes(io.BytesIO(f.read()))
+    pixels = carrier.load_image(path)
+    assert not pixels.flags.writeable
+    assert carrier.load_image(path) is pixels
+
+
+def test_output_is_cached_as_written(make_image, tmp_path):
+    output = str(tmp_path / 'stego.png')
+    HideImage(make_image(), output).embed_text_lsb("cached")
+    assert not decodes(output)
+
+
+def test_eviction_by_memory_budget(make_image, monkeypatch):
+    paths = [make_image('noise', name=name) for name in 'abc']
+    # Room for two of the three carriers
+    monkeypatch.setattr(carrier, 'CACHE_BYTES', 2 * 40 * 50 * 3)
+    for path in paths:
+        assert decodes(path)
+    assert len(carrier._cache) == 2
+    assert not decodes(paths[2])
+    assert not decodes(paths[1])
+    # The least recently used carrier was dropped
+    assert decodes(paths[0])
+    assert carrier._cached_bytes <= carrier.CACHE_BYTES
+
+
+def test_carrier_over_budget_is_not_cached(make_image, monkeypatch):
+    monkeypatch.setattr(carrier, 'CACHE_BYTES', 100)
+    path = make_image()
+    assert decodes(path)
+    assert decodes(path)
+    assert not carrier._cache
+
+
+def test_undecodable_carrier_raises(tmp_path):
+    path = tmp_path / 'broken.png'
+    path.write_bytes(b'not an image')
+    with pytest.raises(ValueError, match='not a supported image format'):
+        carrier.load_image(str(path))
+
+
+@pytest.mark.parametrize('orientation', range(1, 9))
+def test_upright_pixels_match_imread(tmp_path, rng, orientation):
+    path = str(tmp_path / 'oriented.png')
+    image = Image.fromarray(rng.integers(0, 256, (4, 6, 3), dtype=np.uint8))
+    exif = image.getexif()
+    exif[carrier.ORIENTATION_TAG] = orientation
+    image.save(path, exif=exif)
+    assert np.array_equal(carrier.load_upright(path), cv2.imread(path))
+    assert np.array_equal(carrier.load_image(path), cv2.imread(path, cv2.IMREAD_UNCHANGED))
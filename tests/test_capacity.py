@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import io
+import pytest
+from hide import HideAudio, HideImage
+from unhide import UnhideAudio, UnhideImage
+
+
+@pytest.mark.parametrize('width', [1, 2, 3, 4])
+def test_image_capacity_is_exact(make_image, tmp_path, width):
+    carrier = make_image('noise', (10, 12, 3))
+    room = HideImage(carrier, None).capacity()['lsb' if width == 1 else f'lsb{width}']
+    output = str(tmp_path / 'stego.png')
+    HideImage(carrier, output).embed_bytes(b'\xa5' * room, lsb_bits=width)
+    assert UnhideImage(output).extract_bytes() == b'\xa5' * room
+    with pytest.raises(ValueError, match='too long'):
+        HideImage(carrier, output).embed_bytes(b'\xa5' * (room + 1), lsb_bits=width)
+
+
+@pytest.mark.parametrize('width', [1, 4])
+def test_audio_capacity_is_exact(make_wav, tmp_path, width):
+    carrier = make_wav(frames=300, sampwidth=2)
+    room = HideAudio(carrier, None).capacity()['lsb' if width == 1 else f'lsb{width}']
+    assert room == (300 * 2 - 128) * width // 8
+    output = str(tmp_path / 'stego.wav')
+    HideAudio(carrier, output).embed_bytes(b'\x5a' * room, lsb_bits=width)
+    assert UnhideAudio(output).extract_bytes() == b'\x5a' * room
+    with pytest.raises(ValueError):
+        HideAudio(carrier, output).embed_bytes(b'\x5a' * (room + 1), lsb_bits=width)
+
+
+def test_audio_capacity_of_file_object(make_wav):
+    path = make_wav(frames=300)
+    with open(path, 'rb') as f:
+        assert HideAudio(io.BytesIO(f.read()), None).capacity() == HideAudio(path, None).capacity()
+
+
+def test_image_capacity_is_cached(make_image, monkeypatch):
+    carrier = make_image()
+    first = HideImage(carrier, None).capacity()
+    monkeypatch.setattr('capacity.pvd_capacity', None)
+    first['lsb'] = -1
+    assert HideImage(carrier, None).capacity()['lsb'] != -1
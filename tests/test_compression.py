@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import pytest
+from hide import HideAudio, HideImage
+from payload import CODECS, compress, decompress, pack_payload, parse_header
+from unhide import UnhideAudio, UnhideImage
+
+DATA = b'a compressible payload, ' * 20
+
+
+@pytest.mark.parametrize('codec', sorted(CODECS))
+def test_codec_round_trip(codec):
+    name, stored = compress(DATA, codec)
+    assert name == codec
+    assert decompress(stored, codec) == DATA
+
+
+def test_auto_keeps_the_smallest():
+    name, stored = compress(DATA, 'auto')
+    assert len(stored) == min(len(compress(DATA, codec)[1]) for codec in CODECS)
+    assert parse_header(pack_payload(DATA, 'lsb', 'auto')[0], 'lsb')[0] == name
+
+
+def test_unknown_codec_raises():
+    with pytest.raises(ValueError, match='Unknown codec'):
+        compress(DATA, 'rar')
+
+
+@pytest.mark.parametrize('codec', sorted(CODECS) + ['auto'])
+def test_compressed_round_trip(make_image, make_wav, tmp_path, codec):
+    output = str(tmp_path / 'stego.png')
+    HideImage(make_image('noise'), output).embed_bytes(DATA, 'lsb', codec)
+    assert UnhideImage(output).extract_bytes() == DATA
+    HideImage(make_image('noise'), output).embed_bytes(DATA, 'pvd', codec)
+    assert UnhideImage(output).extract_bytes('pvd') == DATA
+    output = str(tmp_path / 'stego.wav')
+    HideAudio(make_wav(), output).embed_bytes(DATA, codec)
+    assert UnhideAudio(output).extract_bytes() == DATA
+
+
+def test_compression_fits_more(make_image, tmp_path):
+    # Larger than the image holds raw, but not once compressed
+    carrier = make_image('noise', (20, 20, 3))
+    data = DATA * 4
+    assert len(data) > HideImage(carrier, None).capacity()['lsb']
+    output = str(tmp_path / 'stego.png')
+    HideImage(carrier, output).embed_bytes(data, codec='zlib')
+    assert UnhideImage(output).extract_bytes() == data
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import io
+import pytest
+from hide import HideAudio, HideImage
+from unhide import UnhideAudio, UnhideImage
+
+DATA = b'kept in memory\x00' * 8
+
+
+def test_image_buffers_round_trip(make_image):
+    with open(make_image('noise'), 'rb') as f:
+        data = f.read()
+    for source in (data, bytearray(data), memoryview(data), io.BytesIO(data)):
+        output = io.BytesIO()
+        HideImage(source, output).embed_bytes(DATA)
+        assert UnhideImage(output.getvalue()).extract_bytes() == DATA
+
+
+def test_output_named_by_extension(make_image):
+    output = io.BytesIO()
+    output.name = 'stego.bmp'
+    HideImage(make_image('noise'), output).embed_bytes(DATA)
+    assert output.getvalue()[:2] == b'BM'
+
+
+def test_audio_buffers_round_trip(make_wav):
+    with open(make_wav(), 'rb') as f:
+        data = f.read()
+    output = io.BytesIO()
+    HideAudio(io.BytesIO(data), output).embed_bytes(DATA)
+    assert UnhideAudio(output.getvalue()).extract_bytes() == DATA
+    assert UnhideAudio(io.BytesIO(output.getvalue())).extract_bytes() == DATA
+
+
+def test_file_object_is_rewound(make_image, make_wav):
+    with open(make_image('noise'), 'rb') as f:
+        output = io.BytesIO()
+        HideImage(f, output).embed_bytes(DATA)
+        HideImage(f, io.BytesIO()).capacity()
+    unhide = UnhideImage(output)
+    assert unhide.extract_bytes() == DATA
+    assert unhide.extract_bytes() == DATA
+    with open(make_wav(), 'rb') as f:
+        assert HideAudio(f, None).capacity() == HideAudio(f, None).capacity()
+
+
+def test_empty_source_raises():
+    with pytest.raises(ValueError, match='empty'):
+        UnhideImage(io.BytesIO()).extract_bytes()
+    with pytest.raises(ValueError, match='empty'):
+        UnhideImage(b'').extract_text_lsb()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import wave
+import cv2
+import numpy as np
+import pytest
+from hide import HideAudio, HideImage
+from lsb import bytes_to_bits, pack_values, unit_bits
+from unhide import UnhideAudio, UnhideImage
+
+DATA = bytes(range(256)) * 2
+
+
+@pytest.mark.parametrize('width', [1, 2, 3, 4])
+def test_pack_values_round_trip(rng, width):
+    bits = rng.integers(0, 2, 120, dtype=np.uint8)
+    assert np.array_equal(unit_bits(pack_values(bits, width), width)[:bits.size], bits)
+    assert np.array_equal(bytes_to_bits(b'\x81'), [1, 0, 0, 0, 0, 0, 0, 1])
+
+
+@pytest.mark.parametrize('width', [1, 2, 3, 4])
+def test_image_round_trip(make_image, tmp_path, width):
+    carrier = make_image('noise')
+    output = str(tmp_path / 'stego.png')
+    HideImage(carrier, output).embed_bytes(DATA, lsb_bits=width)
+    assert UnhideImage(output).extract_bytes() == DATA
+    # Only the low width bits of any value change
+    changed = cv2.imread(carrier) ^ cv2.imread(output)
+    assert changed.any()
+    assert not (changed >> width).any()
+
+
+@pytest.mark.parametrize('width', [1, 2, 3, 4])
+@pytest.mark.parametrize('sampwidth', [1, 2, 3])
+def test_audio_uses_low_byte_of_each_sample(make_wav, tmp_path, width, sampwidth):
+    carrier = make_wav(sampwidth=sampwidth)
+    output = str(tmp_path / 'stego.wav')
+    HideAudio(carrier, output).embed_bytes(DATA, lsb_bits=width)
+    assert UnhideAudio(output).extract_bytes() == DATA
+    frames = []
+    for path in (carrier, output):
+        with wave.open(path, 'rb') as audio:
+            frames.append(np.frombuffer(audio.readframes(audio.getnframes()), np.uint8).reshape(-1, sampwidth))
+    changed = frames[0] ^ frames[1]
+    assert not changed[:, 1:].any()
+    assert not (changed[:, 0] >> width).any()
+
+
+def test_unsupported_width_raises(make_image, tmp_path):
+    with pytest.raises(ValueError, match='Unsupported bits'):
+        HideImage(make_image(), str(tmp_path / 'stego.png')).embed_bytes(DATA, lsb_bits=5)
+    with pytest.raises(ValueError, match='Unsupported bits'):
+        HideImage(make_image(), str(tmp_path / 'stego.png')).embed_bytes(DATA, 'pvd', lsb_bits=2)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import wave
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+from benchmark import legacy_embed_lsb, legacy_embed_pvd, legacy_extract_lsb, legacy_extract_pvd
+from hide import HideAudio, HideImage
+from unhide import UnhideAudio, UnhideImage
+
+MESSAGE = "Legacy formats stay bit-identical! 0123456789"
+
+
+def legacy_embed_audio(frame_bytes, message):
+    # The original HideAudio.embed_text_lsb loop, on the frame bytes
+    frame_bytes = bytearray(frame_bytes)
+    message_bits = ''.join(format(ord(char), '08b') for char in message) + '00000000'
+    for i in range(len(message_bits)):
+        frame_bytes[i] = (frame_bytes[i] & 254) | int(message_bits[i])
+    return bytes(frame_bytes)
+
+
+def test_image_lsb_matches_original(make_image, tmp_path):
+    carrier = make_image('noise')
+    output = str(tmp_path / 'stego.png')
+    HideImage(carrier, output).embed_text_lsb(MESSAGE)
+    expected = legacy_embed_lsb(cv2.imread(carrier), MESSAGE)
+    assert np.array_equal(cv2.imread(output), expected)
+    assert UnhideImage(output).extract_text_lsb() == legacy_extract_lsb(expected) == MESSAGE
+
+
+def test_oriented_jpeg_keeps_each_method_layout(rng, tmp_path):
+    # LSB worked on cv2.imread pixels, turned upright by the EXIF orientation;
+    # PVD worked on PIL pixels, as stored
+    carrier = str(tmp_path / 'rotated.jpg')
+    image = Image.fromarray(rng.integers(0, 256, (40, 60, 3), dtype=np.uint8))
+    exif = image.getexif()
+    exif[0x0112] = 6
+    image.save(carrier, exif=exif)
+    output = str(tmp_path / 'stego.png')
+    HideImage(carrier, output).embed_text_lsb(MESSAGE)
+    expected = legacy_embed_lsb(cv2.imread(carrier), MESSAGE)
+    assert expected.shape == (60, 40, 3)
+    assert np.array_equal(cv2.imread(output), expected)
+    assert UnhideImage(carrier).extract_text_lsb() == legacy_extract_lsb(cv2.imread(carrier))
+    HideImage(carrier, output).embed_text_pvd(MESSAGE)
+    assert np.array_equal(np.array(Image.open(output)), legacy_embed_pvd(np.array(Image.open(carrier)), MESSAGE))
+
+
+@pytest.mark.parametrize('kind, shape', [
+    ('gradient', (40, 50, 3)),
+    ('noise', (40, 50, 3)),
+    ('edges', (40, 50, 3)),
+    ('gradient', (40, 51)),
+    ('noise', (30, 40, 4)),
+])
+def test_image_pvd_matches_original(make_image, tmp_path, kind, shape):
+    carrier = make_image(kind, shape)
+    output = str(tmp_path / 'stego.png')
+    HideImage(carrier, output).embed_text_pvd(MESSAGE)
+    expected = legacy_embed_pvd(np.array(Image.open(carrier)), MESSAGE)
+    stego = np.array(Image.open(output))
+    assert np.array_equal(stego, expected)
+    assert UnhideImage(output).extract_text_pvd() == legacy_extract_pvd(stego)
+
+
+@pytest.mark.parametrize('channels, sampwidth', [(1, 1), (2, 2), (1, 3)])
+def test_audio_lsb_matches_original(make_wav, tmp_path, channels, sampwidth):
+    carrier = make_wav(channels=channels, sampwidth=sampwidth)
+    output = str(tmp_path / 'stego.wav')
+    HideAudio(carrier, output, chunk_frames=256).embed_text_lsb(MESSAGE)
+    with wave.open(carrier, 'rb') as audio:
+        params = audio.getparams()
+        expected = legacy_embed_audio(audio.readframes(audio.getnframes()), MESSAGE)
+    with wave.open(output, 'rb') as audio:
+        assert audio.getparams() == params
+        assert audio.readframes(audio.getnframes()) == expected
+    # The original reader also checked for the terminator between bytes, so
+    # extraction is compared with the message rather than with that loop
+    assert UnhideAudio(output, chunk_frames=256).extract_text_lsb() == MESSAGE
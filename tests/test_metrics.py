@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import threading
+import tracemalloc
+import pytest
+import metrics
+from hide import HideAudio, HideImage
+from unhide import UnhideAudio, UnhideImage
+
+MESSAGE = "measured"
+
+
+def record_of(call, trace_memory=False):
+    records = []
+    with metrics.recording(records.append, trace_memory=trace_memory):
+        call()
+    assert len(records) == 1
+    return records[0]
+
+
+def test_outermost_call_is_recorded(make_image, tmp_path):
+    output = str(tmp_path / 'stego.png')
+    record = record_of(lambda: HideImage(make_image('noise'), output).embed_text(MESSAGE))
+    assert record['operation'] == 'HideImage.embed_text'
+    assert record['error'] is None
+    assert {'pack', 'embed', 'write'} <= set(record['stages'])
+    assert record['counters']['pixels'] == 40 * 50
+    assert record['counters']['values'] > 0
+    assert 'peak_bytes' not in record
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_every_method_counts_values(make_image, make_wav, tmp_path, workers):
+    carrier, output = make_image('noise'), str(tmp_path / 'stego.png')
+    calls = [
+        lambda: HideImage(carrier, output, workers=workers).embed_text_lsb(MESSAGE),
+        lambda: UnhideImage(output, workers=workers).extract_text_lsb(),
+        lambda: HideImage(carrier, output, workers=workers).embed_text_pvd(MESSAGE),
+        lambda: UnhideImage(output, workers=workers).extract_text_pvd(),
+        lambda: HideImage(carrier, output, workers=workers).embed_bytes(b'data', 'pvd'),
+        lambda: UnhideImage(output, workers=workers).extract_bytes('pvd'),
+        lambda: HideAudio(make_wav(), str(tmp_path / 'stego.wav')).embed_text_lsb(MESSAGE),
+        lambda: UnhideAudio(str(tmp_path / 'stego.wav')).extract_text_lsb(),
+    ]
+    for call in calls:
+        record = record_of(call)
+        assert record['counters']['values'] > 0, record['operation']
+
+
+def test_values_follow_the_message_length(make_image, tmp_path):
+    carrier, output = make_image('noise'), str(tmp_path / 'stego.png')
+    short = record_of(lambda: HideImage(carrier, output).embed_bytes(b'x', 'pvd'))
+    long = record_of(lambda: HideImage(carrier, output).embed_bytes(b'x' * 100, 'pvd'))
+    assert short['counters']['values'] < long['counters']['values']
+    HideImage(carrier, output).embed_text_lsb(MESSAGE)
+    record = record_of(lambda: UnhideImage(output).extract_text_lsb())
+    # The first chunk read already holds the terminator
+    assert 8 * (len(MESSAGE) + 1) <= record['counters']['values'] < 40 * 50 * 3
+
+
+def test_errors_are_recorded(tmp_path):
+    records = []
+    with metrics.recording(records.append):
+        with pytest.raises(ValueError):
+            UnhideImage(str(tmp_path / 'missing.png')).extract_bytes()
+    assert records[0]['operation'] == 'UnhideImage.extract_bytes'
+    assert 'missing.png' in records[0]['error']
+
+
+def test_nothing_is_recorded_without_a_sink(make_image, tmp_path):
+    records = []
+    with metrics.recording(records.append):
+        pass
+    HideImage(make_image(), str(tmp_path / 'stego.png')).embed_text(MESSAGE)
+    assert records == []
+
+
+def test_recording_only_sees_its_own_thread(make_image, tmp_path):
+    carrier = make_image('noise')
+    records = []
+
+    def other():
+        HideImage(carrier, str(tmp_path / 'other.png')).embed_text(MESSAGE)
+
+    with metrics.recording(records.append):
+        thread = threading.Thread(target=other)
+        thread.start()
+        thread.join()
+        HideImage(carrier, None).capacity()
+    assert [record['operation'] for record in records] == ['HideImage.capacity']
+
+
+def test_global_sinks_see_every_thread(make_image, tmp_path):
+    carrier = make_image('noise')
+    target = io.StringIO()
+    sink = metrics.JsonLinesSink(target)
+    metrics.add_sink(sink)
+    try:
+        thread = threading.Thread(target=lambda: UnhideImage(carrier).probe())
+        thread.start()
+        thread.join()
+        HideImage(carrier, None).capacity()
+    finally:
+        metrics.remove_sink(sink)
+    operations = [json.loads(line)['operation'] for line in target.getvalue().splitlines()]
+    assert sorted(operations) == ['HideImage.capacity', 'UnhideImage.probe']
+
+
+def test_json_lines_sink_appends_to_a_path(make_image, tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    with metrics.recording(metrics.JsonLinesSink(path)):
+        HideImage(make_image(), None).capacity()
+        HideImage(make_image(), None).capacity()
+    with open(path, encoding='utf-8') as f:
+        assert [json.loads(line)['operation'] for line in f] == ['HideImage.capacity'] * 2
+
+
+def test_trace_memory_starts_and_stops_tracemalloc(make_image):
+    assert not tracemalloc.is_tracing()
+    record = record_of(lambda: HideImage(make_image(), None).capacity(), trace_memory=True)
+    assert record['peak_bytes'] > 0
+    assert 'peak_shared' not in record
+    assert not tracemalloc.is_tracing()
+
+
+def test_trace_memory_keeps_tracing_started_by_the_caller(make_image):
+    tracemalloc.start()
+    try:
+        record_of(lambda: HideImage(make_image(), None).capacity(), trace_memory=True)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_overlapping_traced_calls_share_one_trace(make_image):
+    # The first call is held open while a second traced call runs, so both
+    # peaks cover each other's allocations; tracing stops after the last
+    carrier = make_image('noise')
+    entered, release = threading.Event(), threading.Event()
+    records = []
+
+    def held(image_path):
+        entered.set()
+        release.wait(10)
+        return {}
+
+    slow = metrics.measured(held)
+
+    def first():
+        with metrics.recording(records.append, trace_memory=True):
+            slow(carrier)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    entered.wait(10)
+    try:
+        record = record_of(lambda: HideImage(carrier, None).capacity(), trace_memory=True)
+        assert tracemalloc.is_tracing()
+    finally:
+        release.set()
+        thread.join()
+    assert record['peak_shared']
+    assert records[0]['peak_shared']
+    assert not tracemalloc.is_tracing()
+    # A call after the overlap has ended gets its own peak again
+    assert 'peak_shared' not in record_of(lambda: HideImage(carrier, None).capacity(), trace_memory=True)
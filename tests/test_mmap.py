@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from hide import HideAudio, HideImage
+from rawio import mapped_carrier
+from unhide import UnhideAudio, UnhideImage
+
+MESSAGE = "mapped in place"
+
+
+@pytest.mark.parametrize('ext', ['.bmp', '.ppm', '.pgm'])
+def test_image_text_round_trip(make_image, tmp_path, ext):
+    shape = (40, 50) if ext == '.pgm' else (40, 50, 3)
+    output = str(tmp_path / f'stego{ext}')
+    HideImage(make_image('noise', shape, ext), output, use_mmap=True).embed_text_lsb(MESSAGE)
+    assert UnhideImage(output, use_mmap=True).extract_text_lsb() == MESSAGE
+
+
+@pytest.mark.parametrize('ext', ['.bmp', '.ppm'])
+def test_mapped_colour_file_matches_decoding_path(make_image, tmp_path, ext):
+    carrier = make_image('noise', ext=ext)
+    mapped, decoded = str(tmp_path / f'mapped{ext}'), str(tmp_path / f'decoded{ext}')
+    HideImage(carrier, mapped, use_mmap=True).embed_text_lsb(MESSAGE)
+    HideImage(carrier, decoded).embed_text_lsb(MESSAGE)
+    with mapped_carrier(mapped) as a, mapped_carrier(decoded) as b:
+        assert np.array_equal(a, b)
+    assert UnhideImage(mapped).extract_text_lsb() == MESSAGE
+
+
+def test_same_path_patches_in_place(make_image):
+    carrier = make_image('noise', ext='.bmp')
+    HideImage(carrier, carrier, use_mmap=True).embed_text_lsb(MESSAGE)
+    assert UnhideImage(carrier, use_mmap=True).extract_text_lsb() == MESSAGE
+
+
+@pytest.mark.parametrize('sampwidth', [1, 2])
+def test_audio_text_round_trip(make_wav, tmp_path, sampwidth):
+    output = str(tmp_path / 'stego.wav')
+    HideAudio(make_wav(sampwidth=sampwidth), output, use_mmap=True).embed_text_lsb(MESSAGE)
+    assert UnhideAudio(output, use_mmap=True).extract_text_lsb() == MESSAGE
+    assert UnhideAudio(output).extract_text_lsb() == MESSAGE
+
+
+def test_compressed_image_is_rejected(make_image, tmp_path):
+    with pytest.raises(ValueError, match='Memory-mapped mode'):
+        HideImage(make_image(), str(tmp_path / 'stego.png'), use_mmap=True).embed_text_lsb(MESSAGE)
+
+
+@pytest.mark.parametrize('ext, cut', [('.ppm', 9), ('.ppm', 200), ('.pgm', 12), ('.bmp', 40), ('.bmp', 300)])
+def test_truncated_file_raises(make_image, ext, cut):
+    shape = (40, 50) if ext == '.pgm' else (40, 50, 3)
+    path = make_image('noise', shape, ext)
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:cut])
+    with pytest.raises(ValueError, match='truncated'):
+        UnhideImage(path, use_mmap=True).extract_text_lsb()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import cv2
+import numpy as np
+import pytest
+from hide import HideAudio, HideImage
+from payload import HEADER, pack_payload, parse_header
+from pvd import PvdReader, embed_ranged, pvd_capacity
+from unhide import UnhideAudio, UnhideImage
+
+DATA = b'\x00payload with NUL bytes\xff' * 20
+
+
+def test_header_fields():
+    header, stored = pack_payload(DATA, 'lsb')
+    assert len(header) == HEADER.size
+    assert parse_header(header, 'lsb')[:3] == ('none', 1, len(stored))
+    with pytest.raises(ValueError, match='not embedded with PVD'):
+        parse_header(header, 'pvd')
+    with pytest.raises(ValueError, match='No payload'):
+        parse_header(b'x' * HEADER.size, 'lsb')
+    with pytest.raises(ValueError, match='too small'):
+        parse_header(header[:5], 'lsb')
+    with pytest.raises(ValueError, match='Unknown method'):
+        pack_payload(DATA, 'dct')
+
+
+def test_image_bytes_round_trip(make_image, tmp_path):
+    output = str(tmp_path / 'stego.png')
+    HideImage(make_image('noise'), output).embed_bytes(memoryview(DATA))
+    assert UnhideImage(output).extract_bytes() == DATA
+    HideImage(make_image('noise'), output).embed_text("UTF-8 text: żółw")
+    assert UnhideImage(output).extract_text() == "UTF-8 text: żółw"
+    with pytest.raises(ValueError, match='No payload'):
+        UnhideImage(output).extract_bytes('pvd')
+
+
+def test_audio_bytes_round_trip(make_wav, tmp_path):
+    output = str(tmp_path / 'stego.wav')
+    HideAudio(make_wav(), output).embed_bytes(DATA)
+    assert UnhideAudio(output).extract_bytes() == DATA
+
+
+def test_too_long_payload_raises(make_image, make_wav, tmp_path):
+    with pytest.raises(ValueError, match='too long'):
+        HideImage(make_image(shape=(4, 4, 3)), str(tmp_path / 'stego.png')).embed_bytes(DATA)
+    with pytest.raises(ValueError):
+        HideAudio(make_wav(frames=100), str(tmp_path / 'stego.wav')).embed_bytes(DATA)
+
+
+@pytest.mark.parametrize('kind, shape', [
+    ('gradient', (40, 50, 3)),
+    ('noise', (40, 50, 3)),
+    ('edges', (40, 50, 3)),
+    ('noise', (40, 50)),
+    ('noise', (40, 50, 4)),
+])
+def test_pvd_round_trip_at_full_capacity(make_image, tmp_path, kind, shape):
+    carrier = make_image(kind, shape)
+    room = HideImage(carrier, None).capacity()['pvd']
+    assert room > 0
+    data = bytes(np.random.default_rng(7).integers(0, 256, room, dtype=np.uint8))
+    output = str(tmp_path / 'stego.png')
+    HideImage(carrier, output).embed_bytes(data, 'pvd')
+    assert UnhideImage(output).extract_bytes('pvd') == data
+    with pytest.raises(ValueError):
+        HideImage(carrier, output).embed_bytes(data + b'!', 'pvd')
+
+
+def test_ranged_pvd_keeps_capacity(rng):
+    pixels = rng.integers(0, 256, (30, 40, 3)).astype(np.int32)
+    before = pvd_capacity(pixels)
+    bits = rng.integers(0, 2, before, dtype=np.uint8)
+    assert embed_ranged(pixels, bits) == before
+    assert pvd_capacity(pixels) == before
+    read = np.unpackbits(np.frombuffer(PvdReader(pixels).read(before // 8), np.uint8))
+    assert np.array_equal(read, bits[:before - before % 8])
+
+
+def test_black_image_has_no_pvd_room(tmp_path):
+    black = str(tmp_path / 'black.png')
+    cv2.imwrite(black, np.zeros((8, 8, 3), np.uint8))
+    assert HideImage(black, None).capacity()['pvd'] == 0
+    with pytest.raises(ValueError, match='too long'):
+        HideImage(black, str(tmp_path / 'stego.png')).embed_bytes(b'x', 'pvd')
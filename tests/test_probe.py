@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import io
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+import carrier
+from hide import HideAudio, HideImage
+from payload import HEADER
+from unhide import UnhideAudio, UnhideImage
+
+DATA = b'probe me' * 10
+
+
+def test_probe_needs_payload_and_key(make_image, tmp_path):
+    source = make_image('noise')
+    assert not UnhideImage(source).probe()
+    assert not UnhideImage(source).probe('pvd')
+    output = str(tmp_path / 'stego.png')
+    HideImage(source, output).embed_bytes(DATA, key='right')
+    assert not UnhideImage(output).probe()
+    assert not UnhideImage(output).probe(key='wrong')
+    assert UnhideImage(output).probe(key='right')
+    HideImage(source, output).embed_bytes(DATA, 'pvd')
+    assert UnhideImage(output).probe('pvd')
+    assert not UnhideImage(output).probe()
+
+
+def test_audio_probe(make_wav, tmp_path):
+    source = make_wav()
+    assert not UnhideAudio(source).probe()
+    assert not UnhideAudio(io.BytesIO(b'not a wav file')).probe()
+    output = str(tmp_path / 'stego.wav')
+    HideAudio(source, output).embed_bytes(DATA)
+    assert UnhideAudio(output).probe()
+    assert UnhideAudio(output, use_mmap=True).probe()
+
+
+def test_probe_skips_the_cache(make_image, tmp_path):
+    output = str(tmp_path / 'stego.png')
+    HideImage(make_image('noise', (200, 300, 3)), output).embed_bytes(DATA)
+    carrier.clear_cache()
+    with open(output, 'rb') as f:
+        for source in (output, f.read()):
+            assert UnhideImage(source).probe()
+    assert not carrier._cache
+
+
+def test_damaged_payload_fails_checksum(make_image, tmp_path):
+    output = str(tmp_path / 'stego.png')
+    HideImage(make_image('noise'), output).embed_bytes(DATA)
+    pixels = cv2.imread(output)
+    # Flip the low bit of a value holding data, past the header
+    pixels.reshape(-1)[HEADER.size * 8 + 5] ^= 1
+    cv2.imwrite(output, pixels)
+    assert UnhideImage(output).probe()
+    with pytest.raises(ValueError, match='checksum'):
+        UnhideImage(output).extract_bytes()
+
+
+@pytest.mark.parametrize('ext, shape', [
+    ('.png', (30, 20, 3)),
+    ('.png', (30, 20)),
+    ('.png', (30, 20, 4)),
+    ('.bmp', (30, 20, 3)),
+    ('.jpg', (30, 20, 3)),
+])
+def test_top_rows_match_full_decode(make_image, ext, shape):
+    path = make_image('noise', shape, ext)
+    for units in (1, 60, 61, 5000):
+        rows = carrier.load_top_rows(path, units)
+        assert np.array_equal(rows, carrier.load_upright(path)[:len(rows)])
+        assert rows.shape[0] == min(-(-units // 60), 30)
+
+
+def test_top_rows_of_oriented_image(tmp_path, rng):
+    path = str(tmp_path / 'oriented.png')
+    image = Image.fromarray(rng.integers(0, 256, (20, 30, 3), dtype=np.uint8))
+    exif = image.getexif()
+    exif[carrier.ORIENTATION_TAG] = 6
+    image.save(path, exif=exif)
+    assert np.array_equal(carrier.load_top_rows(path, 100), cv2.imread(path)[:2])
+
+
+def test_unreadable_image_probes_false(tmp_path):
+    path = tmp_path / 'broken.png'
+    path.write_bytes(b'\x89PNG\r\n\x1a\nnot really')
+    assert not UnhideImage(str(path)).probe()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import cv2
+import numpy as np
+import pytest
+from hide import HideAudio, HideImage
+from scatter import KeyedPermutation, keyed_order
+from unhide import UnhideAudio, UnhideImage
+
+DATA = b'scattered payload' * 10
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 1000, 4097])
+def test_permutation_is_bijection(size):
+    order = KeyedPermutation(size, 'key').map(np.arange(size))
+    assert np.array_equal(np.sort(order), np.arange(size))
+
+
+def test_permutation_depends_on_key():
+    first = KeyedPermutation(1000, 'key').map(np.arange(1000))
+    assert np.array_equal(first, KeyedPermutation(1000, b'key').map(np.arange(1000)))
+    assert not np.array_equal(first, KeyedPermutation(1000, 'other').map(np.arange(1000)))
+    assert keyed_order(1000, None) is None
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_image_round_trip(make_image, tmp_path, use_mmap):
+    ext = '.bmp' if use_mmap else '.png'
+    output = str(tmp_path / f'stego{ext}')
+    HideImage(make_image('noise', ext=ext), output, use_mmap).embed_bytes(DATA, key='key')
+    assert UnhideImage(output, use_mmap).extract_bytes(key='key') == DATA
+    with pytest.raises(ValueError):
+        UnhideImage(output, use_mmap).extract_bytes(key='wrong')
+    HideImage(make_image('noise', ext=ext), output, use_mmap).embed_text_lsb("keyed text", key='key')
+    assert UnhideImage(output, use_mmap).extract_text_lsb(key='key') == "keyed text"
+
+
+@pytest.mark.parametrize('use_mmap', [False, True])
+def test_audio_round_trip(make_wav, tmp_path, use_mmap):
+    output = str(tmp_path / 'stego.wav')
+    HideAudio(make_wav(), output, 256, use_mmap).embed_bytes(DATA, key='key')
+    assert UnhideAudio(output, 256, use_mmap).extract_bytes(key='key') == DATA
+    HideAudio(make_wav(), output, 256, use_mmap).embed_text_lsb("keyed text", key='key')
+    assert UnhideAudio(output, 256, use_mmap).extract_text_lsb(key='key') == "keyed text"
+
+
+def test_payload_is_spread_over_the_carrier(make_image, tmp_path):
+    carrier = make_image('noise', (100, 100, 3))
+    output = str(tmp_path / 'stego.png')
+    HideImage(carrier, output).embed_bytes(b'x' * 40, key='key')
+    # Unkeyed, 56 bytes of header and data would fill the first two rows
+    rows = np.flatnonzero(np.any(cv2.imread(carrier) != cv2.imread(output), axis=(1, 2)))
+    assert rows.max() > 50
+
+
+def test_pvd_rejects_key(make_image, tmp_path):
+    with pytest.raises(ValueError, match='only available for LSB'):
+        HideImage(make_image(), str(tmp_path / 'stego.png')).embed_bytes(DATA, 'pvd', key='key')
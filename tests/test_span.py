@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import os
+import pytest
+import span
+from span import SEQUENCE, hide_across, join_parts, split_payload, unhide_across
+
+DATA = bytes(range(256)) * 6
+
+
+@pytest.fixture
+def carriers(make_wav):
+    return [make_wav(frames, name=f'part{frames}') for frames in (1500, 3000, 2200)]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_round_trip_in_any_order(carriers, tmp_path, workers):
+    outputs = [str(tmp_path / f'out{i}.wav') for i in range(3)]
+    hide_across(carriers, outputs, DATA, 'zlib', 2, 'shared key', workers, chunk_frames=256)
+    assert unhide_across(outputs[::-1], 'shared key', workers, chunk_frames=256) == DATA
+    with pytest.raises(ValueError, match='Expected parts'):
+        unhide_across(outputs[:2], 'shared key')
+
+
+def test_parts_follow_capacity():
+    parts = split_payload(DATA, [100, 1000, 600])
+    assert sum(len(part) - SEQUENCE.size for part in parts) == len(DATA)
+    assert all(len(part) <= capacity for part, capacity in zip(parts, [100, 1000, 600]))
+    assert join_parts(parts[::-1]) == DATA
+    with pytest.raises(ValueError, match='does not fit'):
+        split_payload(DATA, [100, 100])
+
+
+def test_small_carrier_is_rejected_before_splitting():
+    with pytest.raises(ValueError, match='Carrier 1 holds 10 bytes'):
+        split_payload(b'x', [100, 10, 100])
+
+
+def test_parts_of_different_payloads_are_rejected():
+    first, second = split_payload(DATA, [1000, 1000]), split_payload(DATA[::-1], [1000, 1000])
+    with pytest.raises(ValueError, match='different payloads'):
+        join_parts([first[0], second[1]])
+
+
+def test_cli_keeps_carriers_with_the_same_name(make_wav, tmp_path):
+    for folder in ('day1', 'day2'):
+        (tmp_path / folder).mkdir()
+    carriers = [make_wav(4000, name=f'{folder}/track') for folder in ('day1', 'day2')]
+    payload, recovered, stego = tmp_path / 'payload.bin', tmp_path / 'recovered.bin', tmp_path / 'stego'
+    payload.write_bytes(DATA)
+    assert span.main(['hide', *carriers, '--output', str(stego), '--input', str(payload), '--workers', '1']) == 0
+    outputs = sorted(str(stego / name) for name in os.listdir(stego))
+    assert [os.path.basename(output) for output in outputs] == ['track-0.wav', 'track-1.wav']
+    assert span.main(['unhide', *outputs, '--output', str(recovered), '--workers', '1']) == 0
+    assert recovered.read_bytes() == DATA
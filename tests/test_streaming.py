@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import cv2
+import pytest
+from hide import HideAudio, HideImage
+from payload import HEADER
+from unhide import UnhideAudio, UnhideImage, decode_stream
+
+TEXT = "streamed żółw text, " * 30
+
+
+@pytest.fixture
+def stego_image(make_image, tmp_path):
+    output = str(tmp_path / 'stego.png')
+    HideImage(make_image('noise', (60, 60, 3)), output).embed_text(TEXT, codec='zlib')
+    return output
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 16])
+def test_pieces_join_to_the_payload(stego_image, chunk_size):
+    unhide = UnhideImage(stego_image)
+    pieces = list(unhide.iter_bytes(chunk_size=chunk_size))
+    assert b''.join(pieces) == unhide.extract_bytes()
+    assert max(map(len, pieces)) <= chunk_size
+    assert ''.join(unhide.iter_text(chunk_size=chunk_size)) == TEXT
+
+
+@pytest.mark.parametrize('method', ['lsb', 'pvd'])
+def test_codecs_stream(make_image, tmp_path, method):
+    output = str(tmp_path / 'stego.png')
+    for codec in ('none', 'zlib', 'bz2', 'lzma'):
+        HideImage(make_image('noise', (60, 60, 3)), output).embed_text(TEXT, method, codec)
+        assert ''.join(UnhideImage(output).iter_text(method, chunk_size=5)) == TEXT
+
+
+def test_audio_stream(make_wav, tmp_path):
+    output = str(tmp_path / 'stego.wav')
+    HideAudio(make_wav(), output, 256).embed_text(TEXT[:200], key='key')
+    assert ''.join(UnhideAudio(output, 256).iter_text(key='key', chunk_size=9)) == TEXT[:200]
+
+
+def test_decode_stream_holds_split_characters():
+    data = "żółw".encode('utf-8')
+    assert list(decode_stream([data[:1], data[1:3], data[3:]])) == ['ż', 'ółw']
+    with pytest.raises(UnicodeDecodeError):
+        list(decode_stream([data[:1]]))
+
+
+def test_damage_is_reported_at_the_end(stego_image):
+    pixels = cv2.imread(stego_image)
+    pixels.reshape(-1)[HEADER.size * 8 + 3] ^= 1
+    cv2.imwrite(stego_image, pixels)
+    with pytest.raises(ValueError):
+        list(UnhideImage(stego_image).iter_bytes(chunk_size=4))
+
+
+def test_early_exit_reads_one_piece(stego_image):
+    stream = UnhideImage(stego_image).iter_bytes(chunk_size=16)
+    assert 0 < len(next(stream)) <= 16
+    stream.close()
+
+
+@pytest.mark.parametrize('chunk_size', [0, -1])
+def test_chunk_size_must_be_positive(stego_image, chunk_size):
+    with pytest.raises(ValueError, match='chunk_size'):
+        next(UnhideImage(stego_image).iter_bytes(chunk_size=chunk_size))
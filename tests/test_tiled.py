@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+from PIL import Image
+from hide import HideImage
+from pvd import embed_pvd, embed_ranged, pvd_bit_chunks, read_pvd_bits
+from unhide import UnhideImage
+
+
+@pytest.mark.parametrize('kind', ['gradient', 'noise'])
+def test_tiles_match_serial_scan(make_image, rng, kind):
+    pixels = np.array(Image.open(make_image(kind, (60, 40, 3)))).astype(np.int32)
+    bits = rng.integers(0, 2, 5000, dtype=np.uint8)
+    serial, tiled = pixels.copy(), pixels.copy()
+    assert embed_pvd(serial, bits) == embed_pvd(tiled, bits, block_rows=7, workers=3)
+    assert np.array_equal(serial, tiled)
+    assert np.array_equal(read_pvd_bits(serial, 3000), read_pvd_bits(serial, 3000, block_rows=7, workers=3))
+
+    serial, tiled = pixels.copy(), pixels.copy()
+    assert embed_ranged(serial, bits) == embed_ranged(tiled, bits, block_rows=7, workers=3)
+    assert np.array_equal(serial, tiled)
+    assert np.array_equal(np.concatenate(list(pvd_bit_chunks(serial))),
+                          np.concatenate(list(pvd_bit_chunks(serial, block_rows=7, workers=3))))
+
+
+def test_workers_give_the_same_files(make_image, tmp_path):
+    carrier = make_image('noise', (50, 30, 3))
+    outputs = [str(tmp_path / f'stego{workers}.png') for workers in (1, 4)]
+    for workers, output in zip((1, 4), outputs):
+        HideImage(carrier, output, workers=workers).embed_text_pvd("tiled text")
+    assert np.array_equal(*(np.array(Image.open(output)) for output in outputs))
+    assert UnhideImage(outputs[0], workers=4).extract_text_pvd() == UnhideImage(outputs[0]).extract_text_pvd()
@@ -1,119 +1,215 @@
+import codecs
 import wave
-import cv2
-from PIL import Image
-import numpy as np
-from operations import  bin_to_str, get_capacity
+from contextlib import contextmanager
+from lsb import (LsbReader, ScatterReader, carrier_chunks, carrier_reader, gather_chunks,
+                 scan_until_null, scattered_chunks)
+from pvd import PvdReader, extract_pvd, bits_to_str
+from wavio import CHUNK_FRAMES, open_wave, iter_frames
+from rawio import mapped_carrier
+from payload import HEADER, STREAM_CHUNK, has_payload, iter_payload, read_payload
+from carrier import load_image, load_top_rows, load_upright, lsb_view, pvd_pixels, rgb_view
+from scatter import keyed_order
+from metrics import instrument, stage
 
+
+def decode_stream(pieces):
+    # Decode a stream of UTF-8 byte pieces; characters split across pieces
+    # are held back until they are complete
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for piece in pieces:
+        text = decoder.decode(piece)
+        if text:
+            yield text
+    decoder.decode(b'', final=True)
+
+@instrument
 class UnhideImage:
-    def __init__(self, image_path):
+    # image_path may also be encoded image bytes, a file-like object or a
+    # decoded array (see carrier.load_image); decoded images are cached.
+    # use_mmap: read uncompressed carriers (BMP, PPM/PGM) through a zero-copy
+    # memory-mapped view; applies to LSB extraction
+    # workers: threads extracting PVD row tiles in parallel (same output)
+    def __init__(self, image_path, use_mmap=False, workers=1):
         self.image_path = image_path
+        self.use_mmap = use_mmap
+        self.workers = workers
     
-    def extract_text_lsb(self):
+    def extract_text_lsb(self, key=None):
+        # key: the passphrase the message was scattered with, if any
         try:
-            image = cv2.imread(self.image_path)
-            if image is None:
-                raise ValueError("Image not found. Check the path.")
-            flat_image = image.flatten()
-            binary_message = ''.join(str(flat_image[i] & 1) for i in range(len(flat_image)))
-            chars = [binary_message[i:i+8] for i in range(0, len(binary_message), 8)]
-            message = ''
-            for char in chars:
-                if char == '00000000':
-                    break
-                message += chr(int(char, 2))
+            if self.use_mmap:
+                with mapped_carrier(self.image_path) as pixels:
+                    return scan_until_null(carrier_chunks(pixels, keyed_order(pixels.size, key))).decode('latin-1')
+            flat = lsb_view(load_upright(self.image_path)).reshape(-1)
+            with stage('extract'):
+                message = scan_until_null(carrier_chunks(flat, keyed_order(flat.size, key))).decode('latin-1')
             return message
         except Exception as e:
             raise ValueError(f"Error extracting text: {e}")
     
+    def extract_bytes(self, method='lsb', key=None):
+        # Read the header, then exactly the number of bytes it declares; key
+        # is the passphrase an LSB payload was scattered with, if any
+        try:
+            with self._reader(method, key) as reader, stage('extract'):
+                return read_payload(reader, method)
+        except Exception as e:
+            raise ValueError(f"Error extracting data: {e}")
+
+    def extract_text(self, method='lsb', key=None):
+        # UTF-8 text on top of extract_bytes
+        return self.extract_bytes(method, key).decode('utf-8')
+
+    def iter_bytes(self, method='lsb', key=None, chunk_size=STREAM_CHUNK):
+        # Like extract_bytes, but yield the payload in pieces of at most
+        # chunk_size bytes as the carrier is read; the carrier stays open
+        # (mapped) until the generator is exhausted or closed
+        try:
+            with self._reader(method, key) as reader:
+                yield from iter_payload(reader, method, chunk_size)
+        except Exception as e:
+            raise ValueError(f"Error extracting data: {e}")
+
+    def iter_text(self, method='lsb', key=None, chunk_size=STREAM_CHUNK):
+        # UTF-8 text on top of iter_bytes
+        yield from decode_stream(self.iter_bytes(method, key, chunk_size))
+
+    def probe(self, method='lsb', key=None):
+        # True if the image holds a payload embedded with method (and key);
+        # only the header is read. Unkeyed LSB decodes just the top rows of
+        # a PNG and leaves the cache alone.
+        try:
+            with self._reader(method, key, HEADER.size) as reader:
+                return has_payload(reader, method)
+        except ValueError:
+            return False
+
+    @contextmanager
+    def _reader(self, method, key, limit=None):
+        # A reader over the payload bytes for payload.read_payload; with
+        # limit, LSB prepares only the rows holding the first limit bytes
+        if method == 'pvd':
+            if key is not None:
+                raise ValueError("Keyed scattering is only available for LSB.")
+            # PvdReader decodes lazily, so the pixels are not converted up front
+            yield PvdReader(rgb_view(load_image(self.image_path)), self.workers)
+        elif self.use_mmap:
+            with mapped_carrier(self.image_path) as pixels:
+                yield carrier_reader(pixels, keyed_order(pixels.size, key))
+        else:
+            # Keyed positions are spread over the whole image
+            flat = lsb_view(self._top_rows(None if key else limit)).reshape(-1)
+            yield carrier_reader(flat, keyed_order(flat.size, key))
+
+    def _top_rows(self, limit):
+        # The image, or just enough top rows for limit bytes read at one bit
+        # per LSB value; those are decoded on their own and not cached
+        if limit is None:
+            return load_upright(self.image_path)
+        return load_top_rows(self.image_path, limit * 8)
+
     def extract_text_pvd(self):
         # Load the stego image
-        stego_image = Image.open(self.image_path)
-        pixels = np.array(stego_image, dtype=np.int32)
-    
-        # Determine image dimensions
-        if len(pixels.shape) == 2:  # Grayscale image
-            rows, cols = pixels.shape
-            channels = 1
-        else:  # Color image
-            rows, cols, channels = pixels.shape
-    
-        binary_message = ''
-    
-        # First extract 32 bits for length prefix
-        length_bits_collected = 0
-        message_length = None  # in bits
+        pixels = pvd_pixels(load_image(self.image_path))
     
-        for channel in range(channels):
-            channel_data = pixels if channels == 1 else pixels[:, :, channel]
-    
-            for row in range(rows):
-                for col in range(0, cols - 1, 2):
-                    p1 = channel_data[row, col]
-                    p2 = channel_data[row, col + 1]
-                    diff = abs(p1 - p2)
-                    bit_capacity = get_capacity(diff)
-                    embedded_bits = format(diff, f'0{bit_capacity}b')
-    
-                    if message_length is None:
-                        # Collect length prefix first
-                        needed = 32 - length_bits_collected
-                        if bit_capacity <= needed:
-                            length_bits_collected += bit_capacity
-                            length_prefix_part = embedded_bits
-                            binary_message += length_prefix_part
-                        else:
-                            # Split bits between length prefix and message
-                            length_prefix_part = embedded_bits[:needed]
-                            binary_message += length_prefix_part
-                            message_length = int(binary_message, 2)
-                            # Start collecting message bits from remainder
-                            message_bits_part = embedded_bits[needed:]
-                            binary_message = ''  # Reset for message bits
-                            binary_message += message_bits_part
-                            length_bits_collected = 32
-                            continue  # continue embedding message bits
-                        if length_bits_collected == 32:
-                            message_length = int(binary_message, 2)
-                            binary_message = ''
-                    else:
-                        binary_message += embedded_bits
-    
-                    # Stop if message bits collected equal length
-                    if message_length is not None and len(binary_message) >= message_length:
-                        binary_message = binary_message[:message_length]
-                        extracted_message = bin_to_str(binary_message)
-                        return extracted_message
-    
-        # If the loop finishes without return, decode whatever collected
-        if message_length is not None:
-            binary_message = binary_message[:message_length]
-            return bin_to_str(binary_message)
-        else:
-            return ''  # No message found
+        # Read the length prefix, then only as many pairs as the message needs
+        with stage('extract'):
+            return bits_to_str(extract_pvd(pixels, workers=self.workers))
 
+@instrument
 class UnhideAudio:
-    def __init__(self, audio_path):
+    # audio_path may be a path, a file-like object or a bytes buffer.
+    # use_mmap: read PCM WAV files through a zero-copy memory-mapped view
+    def __init__(self, audio_path, chunk_frames=CHUNK_FRAMES, use_mmap=False):
         self.audio_path = audio_path
+        self.chunk_frames = chunk_frames
+        self.use_mmap = use_mmap
 
     def bits_to_text(self, bits):
         chars = [bits[i:i+8] for i in range(0, len(bits), 8)]
         text = ''.join(chr(int(char, 2)) for char in chars if char != '00000000')
         return text
 
-    def extract_text_lsb(self):
+    def extract_text_lsb(self, key=None):
+        # key: the passphrase the message was scattered with, if any
         try:
-            with wave.open(self.audio_path, 'rb') as audio:
-                frame_bytes = bytearray(list(audio.readframes(audio.getnframes())))
-
-                extracted_bits = []
-                for byte in frame_bytes:
-                    extracted_bits.append(str(byte & 1))
-                    # Check for delimiter in chunks of 8 bits
-                    if ''.join(extracted_bits[-8:]) == '00000000':
-                        break
-
-                # Convert the extracted bits back to text
-                message = self.bits_to_text(''.join(extracted_bits))
+            if self.use_mmap:
+                with mapped_carrier(self.audio_path) as frame_bytes:
+                    chunks = carrier_chunks(frame_bytes, keyed_order(frame_bytes.size, key))
+                    return scan_until_null(chunks).decode('latin-1')
+            with open_wave(self.audio_path) as audio:
+                params = audio.getparams()
+                if key is None:
+                    # Frames are read chunk by chunk and reading stops at the terminator
+                    return scan_until_null(iter_frames(audio, self.chunk_frames)).decode('latin-1')
+            permutation = keyed_order(params.nframes * params.nchannels * params.sampwidth, key)
+            message = scan_until_null(scattered_chunks(self._stream_gather(1), permutation)).decode('latin-1')
             return message
         except Exception as e:
             raise ValueError(f"Error extracting text: {e}")
+
+    def extract_bytes(self, key=None):
+        # Read the header, then exactly the number of bytes it declares. The
+        # payload sits in the low bits of each sample's low byte. key is the
+        # passphrase the payload was scattered with, if any.
+        try:
+            with self._reader(key) as reader, stage('extract'):
+                return read_payload(reader, 'lsb')
+        except Exception as e:
+            raise ValueError(f"Error extracting data: {e}")
+
+    def extract_text(self, key=None):
+        # UTF-8 text on top of extract_bytes
+        return self.extract_bytes(key).decode('utf-8')
+
+    def iter_bytes(self, key=None, chunk_size=STREAM_CHUNK):
+        # Like extract_bytes, but yield the payload in pieces of at most
+        # chunk_size bytes while the file is streamed chunk by chunk. Keyed
+        # payloads are scattered over the whole file, so each piece then
+        # takes a pass over it; use a large chunk_size or use_mmap for those.
+        try:
+            with self._reader(key) as reader:
+                yield from iter_payload(reader, 'lsb', chunk_size)
+        except Exception as e:
+            raise ValueError(f"Error extracting data: {e}")
+
+    def iter_text(self, key=None, chunk_size=STREAM_CHUNK):
+        # UTF-8 text on top of iter_bytes
+        yield from decode_stream(self.iter_bytes(key, chunk_size))
+
+    def probe(self, key=None):
+        # True if the file holds a payload (scattered with key); only the
+        # header is read, from the first chunk of frames unless keyed
+        try:
+            with self._reader(key) as reader:
+                return has_payload(reader, 'lsb')
+        except (ValueError, EOFError, wave.Error):
+            # Not a WAV file the reader understands
+            return False
+
+    @contextmanager
+    def _reader(self, key):
+        # A reader over the payload bytes for payload.read_payload
+        with open_wave(self.audio_path) as audio:
+            params = audio.getparams()
+            step = params.sampwidth
+            if not self.use_mmap and key is None:
+                yield LsbReader(frames[::step] for frames in iter_frames(audio, self.chunk_frames))
+                return
+        if not self.use_mmap:
+            permutation = keyed_order(params.nframes * params.nchannels, key)
+            yield ScatterReader(self._stream_gather(step), permutation)
+            return
+        with mapped_carrier(self.audio_path) as frame_bytes:
+            samples = frame_bytes[::step]
+            yield carrier_reader(samples, keyed_order(samples.size, key))
+
+    def _stream_gather(self, step):
+        # Read sorted positions of every step-th frame byte by streaming the
+        # file from the start; each call is one pass that stops after the
+        # chunk holding the last position
+        def samples():
+            with open_wave(self.audio_path) as audio:
+                for frames in iter_frames(audio, self.chunk_frames):
+                    yield frames[::step]
+        return lambda positions: gather_chunks(samples(), positions)
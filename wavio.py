@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Chunked access to WAV frame data.
+
+Frames are read a fixed number at a time so that memory use does not grow
+with the length of the recording. Carriers can be paths, file-like objects
+or (for reading) bytes buffers.
+"""
+import io
+import wave
+import numpy as np
+from metrics import count, stage
+
+# Frames read per chunk
+CHUNK_FRAMES = 1 << 16
+
+
+def open_wave(source, mode='rb'):
+    # wave.open for a path, a file-like object or a bytes buffer; file-like
+    # carriers are read from the start
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif mode == 'rb' and hasattr(source, 'seek'):
+        source.seek(0)
+    return wave.open(source, mode)
+
+
+def iter_frames(audio, chunk_frames=CHUNK_FRAMES):
+    # Yield the remaining frame data of an open wave reader as uint8 arrays
+    while True:
+        with stage('read'):
+            frames = audio.readframes(chunk_frames)
+        if not frames:
+            return
+        count('bytes_read', len(frames))
+        yield np.frombuffer(frames, dtype=np.uint8)
+
+
+def write_frames(encoded_audio, frames):
+    # Append frame data (bytes-like) to an open wave writer
+    with stage('write'):
+        encoded_audio.writeframesraw(frames)
+    count('bytes_written', len(frames))
+
+
+def copy_frames(audio, encoded_audio, chunk_frames=CHUNK_FRAMES):
+    # Copy the remaining frames straight through, one chunk at a time
+    for frames in iter_frames(audio, chunk_frames):
+        write_frames(encoded_audio, frames)